@@ -1,7 +1,15 @@
 import networkx as nx
 
-def analyze_graph(G):
-    """Realiza análises básicas no grafo."""
+from betweenness import betweenness
+from create_graphs import create_bipartite_graph
+from process_data import load_processed_data
+
+def analyze_graph(G, mode='exact', transform='inverse', k=None, seed=None, workers=0):
+    """Realiza análises básicas no grafo.
+    
+    A intermediação usa a arrecadação transformada em distância (transform) e
+    pode ser exata, amostrada com k fontes ou paralela (mode); ver betweenness.py.
+    """
     print("Número de nós:", G.number_of_nodes())
     print("Número de arestas:", G.number_of_edges())
     
@@ -10,15 +18,17 @@ def analyze_graph(G):
     print("Centralidade de grau:", degree_centrality)
     
     # Calcula a centralidade de intermediação
-    betweenness_centrality = nx.betweenness_centrality(G, weight='weight')
+    betweenness_centrality, erro = betweenness(G, mode=mode, transform=transform, k=k, seed=seed, workers=workers)
     print("Centralidade de intermediação:", betweenness_centrality)
+    if erro:
+        print(f"Erro máximo estimado da intermediação amostrada (95% de confiança): {erro:.4f}")
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
-    input_file = '../data/processed_arrecadacao.csv'
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = '../data/arrecadacao-estado.csv'
     
     # Carrega os dados processados
-    df = pd.read_csv(input_file)
+    df = load_processed_data(input_file)
     
     # Cria o grafo bipartido
     G = create_bipartite_graph(df)
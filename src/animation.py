@@ -0,0 +1,174 @@
+import os
+import subprocess
+
+import numpy as np
+
+from graph_builder import GraphCache
+from layouts import radial_layout
+from process_data import load_processed_data
+from temporal import PERIOD_NODE, TemporalGraph
+
+# Coluna animada por padrão (a mesma dos grafos por ano de centralidade e subgrafos)
+DEFAULT_COLUMNS = 'IMPOSTO SOBRE IMPORTAÇÃO'
+
+# Faixas de espessura das arestas e de área dos nós (em pontos)
+EDGE_WIDTHS = (0.5, 8.0)
+NODE_SIZES = (100.0, 3000.0)
+
+def frame_data(temporal):
+    """Calcula de uma só vez, para todos os quadros, as espessuras das arestas, as áreas e a participação de cada estado.
+    
+    As espessuras usam o maior peso de todo o período, para que os quadros sejam
+    comparáveis entre si; a área e a cor de cada estado seguem a sua
+    participação na arrecadação do período. Estados ausentes ficam invisíveis.
+    """
+    pesos = np.where(temporal.present, np.clip(temporal.weights, 0.0, None), 0.0)
+    
+    maior = pesos.max() or 1.0
+    larguras = np.where(temporal.present, EDGE_WIDTHS[0] + (EDGE_WIDTHS[1] - EDGE_WIDTHS[0]) * pesos / maior, 0.0)
+    
+    totais = pesos.sum(axis=1, keepdims=True)
+    participacao = np.divide(pesos, totais, out=np.zeros_like(pesos), where=totais > 0)
+    escala = participacao.max() or 1.0
+    tamanhos = np.where(temporal.present, NODE_SIZES[0] + (NODE_SIZES[1] - NODE_SIZES[0]) * participacao / escala, 0.0)
+    
+    return larguras, tamanhos, participacao
+
+class GifFrames:
+    """Acumula os quadros de um GIF já convertidos para paleta (1 byte por pixel) e grava tudo no final."""
+    
+    def __init__(self, output_path, fps):
+        self.output_path = output_path
+        self.fps = fps
+        self.frames = []
+    
+    def add(self, rgba):
+        from PIL import Image
+        # O octree rápido é várias vezes mais barato que o corte mediano padrão, com cores equivalentes nestes gráficos
+        self.frames.append(Image.fromarray(rgba[..., :3]).quantize(256, method=Image.Quantize.FASTOCTREE))
+    
+    def close(self):
+        self.frames[0].save(self.output_path, save_all=True, append_images=self.frames[1:],
+                            duration=round(1000 / self.fps), loop=0)
+
+class FFmpegFrames:
+    """Envia cada quadro (RGBA bruto) ao FFmpeg por um pipe, sem guardar os quadros na memória."""
+    
+    def __init__(self, output_path, fps, size):
+        from matplotlib.animation import FFMpegWriter
+        
+        largura, altura = size
+        self.process = subprocess.Popen(
+            [FFMpegWriter.bin_path(), '-y', '-loglevel', 'error', '-f', 'rawvideo', '-vcodec', 'rawvideo',
+             '-s', f'{largura}x{altura}', '-pix_fmt', 'rgba', '-framerate', str(fps), '-i', 'pipe:',
+             # O H.264 com yuv420p exige dimensões pares
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-vcodec', 'libx264', '-pix_fmt', 'yuv420p', output_path],
+            stdin=subprocess.PIPE
+        )
+    
+    def add(self, rgba):
+        self.process.stdin.write(rgba.tobytes())
+    
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"O FFmpeg terminou com código {self.process.returncode}")
+
+def frame_sink(output_path, fps, size):
+    """Escolhe o destino dos quadros pela extensão: GIF com o Pillow, MP4 com o FFmpeg."""
+    from matplotlib import animation
+    
+    extensao = os.path.splitext(output_path)[1].lower()
+    if extensao == '.gif':
+        return GifFrames(output_path, fps)
+    if extensao == '.mp4':
+        if not animation.writers.is_available('ffmpeg'):
+            raise ValueError("O formato MP4 exige o FFmpeg instalado (use .gif para gravar com o Pillow)")
+        return FFmpegFrames(output_path, fps, size)
+    raise ValueError(f"Formato de animação desconhecido: {extensao!r} (use .gif ou .mp4)")
+
+def animate_revenue(df, output_path, graphs=None, columns=DEFAULT_COLUMNS, fps=4, dpi=100):
+    """Grava uma animação do grafo estado-período ao longo de todos os períodos (anos, trimestres ou meses).
+    
+    A figura e os artistas (uma coleção de arestas, uma de nós e os rótulos) são
+    criados uma única vez; a cada quadro só mudam as espessuras, as áreas, as
+    cores e os textos do período. A parte fixa (nomes dos estados, nó do
+    período, legenda) é desenhada uma única vez e restaurada a cada quadro, e
+    apenas os artistas animados são redesenhados sobre ela (blitting). O
+    FuncAnimation.save redesenharia a figura inteira a cada quadro, por isso
+    os quadros são enviados diretamente ao GIF ou ao FFmpeg. Retorna o
+    caminho do arquivo gravado.
+    """
+    # O matplotlib só é carregado quando uma animação é de fato gravada
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    
+    # Sem um cache compartilhado, os dados são agregados por período aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    temporal = TemporalGraph(graphs.frame, [columns] if isinstance(columns, str) else list(columns), period=graphs.period)
+    larguras, tamanhos, participacao = frame_data(temporal)
+    
+    # Período no centro e estados em círculo, nas mesmas posições em todos os quadros
+    pos = radial_layout(PERIOD_NODE, temporal.states)
+    posicoes = np.array([pos[estado] for estado in temporal.states]).reshape(-1, 2)
+    
+    figure = Figure(figsize=(10, 10), dpi=dpi)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.set_xlim(-1.3, 1.3)
+    ax.set_ylim(-1.3, 1.3)
+    ax.set_aspect('equal')
+    ax.axis('off')
+    
+    # Parte fixa: o nó do período, os nomes dos estados e a legenda de cores
+    ax.scatter([0], [0], s=2500, c='orange', zorder=3)
+    for estado, (x, y) in zip(temporal.states, posicoes):
+        ax.text(1.14 * x, 1.14 * y, estado, ha='center', va='center', fontsize=9, fontweight='bold')
+    
+    # Parte animada: arestas, nós e textos, atualizados a cada quadro
+    arestas = ax.add_collection(LineCollection(np.stack([np.zeros_like(posicoes), posicoes], axis=1),
+                                               colors='gray', alpha=0.6, animated=True))
+    nos = ax.scatter(posicoes[:, 0], posicoes[:, 1], s=tamanhos[0], c=participacao[0], cmap='viridis',
+                     vmin=0.0, vmax=participacao.max() or 1.0, zorder=2, animated=True)
+    rotulo = ax.text(0, 0, '', ha='center', va='center', fontsize=12, fontweight='bold', zorder=4, animated=True)
+    destaque = ax.text(0.5, 1.0, '', transform=ax.transAxes, ha='center', va='bottom', fontsize=14, animated=True)
+    figure.colorbar(nos, ax=ax, shrink=0.6, label='Participação na arrecadação do período')
+    
+    def atualizar(t):
+        arestas.set_linewidths(larguras[t])
+        nos.set_sizes(tamanhos[t])
+        nos.set_array(participacao[t])
+        rotulo.set_text(str(temporal.periods[t]))
+        
+        lider = int(participacao[t].argmax())
+        destaque.set_text(f"{columns if isinstance(columns, str) else 'Arrecadação'} - maior participação: "
+                          f"{temporal.states[lider]} ({participacao[t, lider]:.1%})")
+        return arestas, nos, rotulo, destaque
+    
+    # Desenha a parte fixa uma vez (artistas animados ficam de fora do desenho completo) e guarda o fundo
+    canvas.draw()
+    fundo = canvas.copy_from_bbox(figure.bbox)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    destino = frame_sink(output_path, fps, canvas.get_width_height())
+    for t in range(len(temporal.periods)):
+        canvas.restore_region(fundo)
+        for artista in atualizar(t):
+            figure.draw_artist(artista)
+        destino.add(np.asarray(canvas.buffer_rgba()))
+    destino.close()
+    
+    return output_path
+
+if __name__ == "__main__":
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
+    output_path = 'C:/Users/Mateus/ProjetoReceita/images/animacao_mensal.gif'
+    
+    # Carrega os dados mensais e anima todos os meses
+    df = load_processed_data(input_file, keep_month=True)
+    animate_revenue(df, output_path, graphs=GraphCache(df, resolution='month'))
+    print(f"Animação salva em {output_path}")
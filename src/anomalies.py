@@ -0,0 +1,231 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from graph_builder import GraphCache, period_months
+from metrics_store import METRICS_FILE, MetricsStore
+from process_data import load_processed_data
+from render import RenderOptions
+
+# Opções da detecção: janela móvel do z-score (em pontos da série), limiares do z-score, do desvio
+# robusto (MAD) e da estatística de mudança de patamar, e se as séries são analisadas em escala log
+AnomalyOptions = namedtuple('AnomalyOptions', ['window', 'z_threshold', 'mad_threshold', 'change_threshold', 'log'],
+                            defaults=[12, 3.0, 3.5, 4.0, True])
+
+# Séries processadas por vez: blocos pequenos mantêm os arrays temporários (tempo × séries) no cache do processador
+BLOCK_SERIES = 256
+
+def nan_median(x):
+    """Mediana de cada coluna, ignorando NaN, com uma única ordenação (NaN vai para o fim de cada coluna)."""
+    ordenado = np.sort(x, axis=0)
+    n = (~np.isnan(x)).sum(axis=0)
+    baixo = np.take_along_axis(ordenado, np.maximum((n - 1) // 2, 0)[None, :], axis=0)[0]
+    alto = np.take_along_axis(ordenado, np.maximum(n // 2, 0)[None, :], axis=0)[0]
+    return np.where(n > 0, (baixo + alto) / 2, np.nan)
+
+def cumulative(x, valido):
+    """Somas acumuladas (com um zero inicial) dos valores, dos quadrados e da contagem de pontos válidos."""
+    x0 = np.where(valido, x, 0.0)
+    somas = np.zeros((3, x.shape[0] + 1, x.shape[1]))
+    np.cumsum(x0, axis=0, out=somas[0, 1:])
+    np.cumsum(x0 * x0, axis=0, out=somas[1, 1:])
+    np.cumsum(valido, axis=0, out=somas[2, 1:])
+    return somas
+
+def rolling_zscore(x, valido, somas, window):
+    """z-score de cada ponto em relação aos window pontos anteriores (média e desvio padrão móveis)."""
+    # Somas da janela [t - window, t): acumulado até t menos o acumulado até t - window (zero no início da série)
+    s, s2, n = janela = somas[:, :-1].copy()
+    janela[:, window:] -= somas[:, :-window - 1]
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = s / n
+        desvio = np.sqrt(np.maximum((s2 - s * media) / (n - 1), 0.0))
+        z = (x - media) / desvio
+    
+    # Exige metade da janela preenchida e desvio positivo (séries constantes não têm z-score)
+    return np.where(valido & (n >= max(3, window // 2)) & (desvio > 0), z, np.nan)
+
+def robust_zscore(x):
+    """Desvio de cada ponto em relação à mediana da série, em unidades do MAD (escore de Iglewicz e Hoaglin)."""
+    mediana = nan_median(x)
+    mad = nan_median(np.abs(x - mediana))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(mad > 0, 0.6745 * (x - mediana) / mad, np.nan)
+
+def change_points(x, valido, somas, min_segment):
+    """Melhor ponto de mudança de patamar (média) de cada série; retorna (índice do início do novo patamar, estatística).
+    
+    Para cada corte k, compara a média dos pontos antes e a partir de k,
+    padronizada pelo ruído da série (estimado pelo MAD das primeiras
+    diferenças, que não é afetado pela própria mudança). O maior valor é a
+    estatística da série; -1 indica série sem corte possível.
+    """
+    s, n = somas[0], somas[2]
+    total_s, total_n = s[-1], n[-1]
+    
+    diferencas = np.diff(x, axis=0)
+    ruido = 1.4826 * nan_median(np.abs(diferencas - nan_median(diferencas))) / np.sqrt(2)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diferenca_medias = s / n - (total_s - s) / (total_n - n)
+        estatistica = np.abs(diferenca_medias) * np.sqrt(n * (total_n - n) / total_n) / np.where(ruido > 0, ruido, np.nan)
+    
+    # Os dois lados precisam de pontos suficientes
+    estatistica = np.where((n >= min_segment) & (total_n - n >= min_segment), estatistica, np.nan)
+    
+    possivel = ~np.all(np.isnan(estatistica), axis=0)
+    melhor = np.argmax(np.where(np.isnan(estatistica), -np.inf, estatistica), axis=0)
+    valor = np.take_along_axis(estatistica, melhor[None, :], axis=0)[0]
+    return np.where(possivel, melhor, -1), np.where(possivel, valor, np.nan)
+
+def analyze_block(x, options):
+    """Aplica os três testes a um bloco de séries (tempo × séries); retorna as marcações e as mudanças."""
+    valido = ~np.isnan(x)
+    somas = cumulative(x, valido)
+    
+    z = rolling_zscore(x, valido, somas, options.window)
+    robusto = robust_zscore(x)
+    indice, estatistica = change_points(x, valido, somas, max(3, options.window // 2))
+    
+    return (np.abs(z) > options.z_threshold, np.abs(robusto) > options.mad_threshold,
+            np.where(estatistica > options.change_threshold, indice, -1), estatistica)
+
+class Anomalies:
+    """Anomalias de todas as séries estado × imposto do cubo de arrecadação, calculadas de uma só vez.
+    
+    O tempo é o eixo (Ano, Mês) do cubo achatado (com dados anuais, um ponto
+    por ano). zscore e mad marcam pontos (tempo × estado × imposto) fora do
+    padrão; change_time guarda, por estado e imposto, o índice de tempo em que
+    começa um novo patamar (-1 quando não há mudança significativa).
+    """
+    
+    def __init__(self, cube, options=AnomalyOptions()):
+        self.cube = cube
+        self.options = options
+        
+        anos, meses, estados, colunas = cube.values.shape
+        valores = cube.values.reshape(anos * meses, estados * colunas)
+        presentes = cube.present.reshape(anos * meses, estados)
+        
+        # Os anos do cubo seguem a ordem dos dados; as séries são analisadas em ordem cronológica
+        cronologia = (np.argsort(cube.years)[:, None] * meses + np.arange(meses)).ravel()
+        
+        self.zscore = np.zeros(valores.shape, dtype=bool)
+        self.mad = np.zeros(valores.shape, dtype=bool)
+        self.change_time = np.full(valores.shape[1], -1)
+        self.change_stat = np.full(valores.shape[1], np.nan)
+        
+        # Blocos de séries inteiras: cada bloco é processado com operações sobre arrays, sem laço por série
+        for inicio in range(0, valores.shape[1], BLOCK_SERIES):
+            series = np.arange(inicio, min(inicio + BLOCK_SERIES, valores.shape[1]))
+            x = np.where(presentes[np.ix_(cronologia, series // colunas)], valores[np.ix_(cronologia, series)], np.nan)
+            if options.log:
+                # Na escala log, valores zerados (impostos não arrecadados no período) ficam de fora, como os ausentes
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    x = np.where(x > 0, np.log(x), np.nan)
+            
+            zscore, mad, mudanca, estatistica = analyze_block(x, options)
+            # Volta os resultados para os índices de tempo do cubo
+            self.zscore[np.ix_(cronologia, series)] = zscore
+            self.mad[np.ix_(cronologia, series)] = mad
+            self.change_time[series] = np.where(mudanca >= 0, cronologia[mudanca], -1)
+            self.change_stat[series] = estatistica
+        
+        forma = (anos * meses, estados, colunas)
+        self.zscore, self.mad = self.zscore.reshape(forma), self.mad.reshape(forma)
+        self.change_time = self.change_time.reshape(estados, colunas)
+        self.change_stat = self.change_stat.reshape(estados, colunas)
+    
+    def times(self, ano=None, months=None):
+        """Índices de tempo de um ano (e meses), ou de todo o histórico com ano=None."""
+        meses = len(self.cube.months)
+        if ano is None:
+            return np.arange(len(self.cube.years) * meses)
+        posicao = self.cube.year_index[ano] * meses
+        if months is None:
+            return np.arange(posicao, posicao + meses)
+        return np.array([posicao + mes - 1 for mes in months])
+    
+    def state_summary(self, ano=None, months=None):
+        """Contagens por estado no recorte: pontos marcados pelo z-score, pelo MAD, pelos dois, e mudanças de patamar."""
+        tempos = self.times(ano, months)
+        zscore, mad = self.zscore[tempos], self.mad[tempos]
+        return pd.DataFrame({
+            'zscore': zscore.sum(axis=(0, 2)),
+            'mad': mad.sum(axis=(0, 2)),
+            'anomalies': (zscore & mad).sum(axis=(0, 2)),
+            'change_points': np.isin(self.change_time, tempos).sum(axis=1),
+        }, index=self.cube.states)
+
+def mark_anomalies(G, anomalies):
+    """Marca as anomalias de cada estado como atributos dos nós do grafo (e as de cada ano, nas arestas estado-ano).
+    
+    Nós dos estados recebem as contagens de todo o histórico e 'anomalo', que
+    indica pontos marcados pelos dois testes ou alguma mudança de patamar;
+    arestas estado-ano recebem 'anomalias', as contagens daquele ano.
+    """
+    resumo = anomalies.state_summary()
+    for estado, linha in resumo.iterrows():
+        if estado in G:
+            G.nodes[estado].update(anomalias_zscore=int(linha['zscore']), anomalias_mad=int(linha['mad']),
+                                   anomalias=int(linha['anomalies']), mudancas=int(linha['change_points']),
+                                   anomalo=bool(linha['anomalies'] or linha['change_points']))
+    
+    for ano in anomalies.cube.years:
+        if ano not in G:
+            continue
+        por_ano = anomalies.state_summary(ano)['anomalies']
+        for estado, contagem in por_ano.items():
+            if G.has_edge(estado, ano):
+                G.edges[estado, ano]['anomalias'] = int(contagem)
+    return G
+
+def find_anomalies(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                   metrics=None, anomaly_options=AnomalyOptions(), anomalies=None):
+    """Detecta anomalias e mudanças de patamar em todas as séries estado × imposto e grava as contagens por período.
+    
+    A análise usa sempre todo o histórico (janelas móveis, medianas e
+    mudanças dependem dos períodos vizinhos); apenas os períodos pedidos em
+    years são gravados. Só estados com alguma marcação geram linhas.
+    anomalies reaproveita uma análise já feita sobre o mesmo cubo (o pipeline
+    faz uma única por execução); sem ela, a análise é feita aqui, com
+    anomaly_options. workers e render_options são aceitos para manter a
+    mesma assinatura das demais etapas do pipeline.
+    """
+    # Sem um cache compartilhado pelo pipeline, o cubo é construído aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    anomalias = Anomalies(graphs.cube, anomaly_options) if anomalies is None else anomalies
+    
+    anos = graphs.years() if years is None else list(years)
+    linhas = {}
+    for periodo in anos:
+        resumo = anomalias.state_summary(*period_months(periodo, graphs.resolution))
+        linhas[periodo] = [(metrica, estado, float(valor))
+                           for metrica in resumo.columns for estado, valor in resumo[metrica].items() if valor]
+    
+    metrics.write('anomalies', linhas)
+    print(f"Anomalias de {len(anos)} período(s) salvas em {metrics.path}")
+    
+    return {periodo: [] for periodo in anos}
+
+if __name__ == "__main__":
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
+    output_folder = 'C:/Users/Mateus/ProjetoReceita/images/anomaly_detection'
+    
+    # Verifica se a pasta de saída existe, caso contrário, cria-a
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    # Carrega os dados mensais (as séries mensais revelam anomalias que a soma anual esconde)
+    df = load_processed_data(input_file, keep_month=True)
+    find_anomalies(df, output_folder)
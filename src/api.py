@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from centrality import centrality_year
+from communities import CommunityOptions, detect
+from connected_components import connected_components_year
+from distances import DistanceMatrix
+from graph_builder import GraphCache, value_columns
+from manifest import slice_key
+from metrics_store import METRICS_FILE, MetricsStore
+from ranking import rank_totals
+
+# Coluna usada quando a consulta não informa o imposto (a mesma das análises por ano)
+DEFAULT_TAX = 'IMPOSTO SOBRE IMPORTAÇÃO'
+
+# Respostas em JSON são enviadas em blocos deste número de itens (Transfer-Encoding: chunked)
+CHUNK_ITEMS = 500
+
+# Mensagem de cada código de status usado pelo serviço
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class QueryError(Exception):
+    """Erro na consulta (parâmetro ausente ou inválido), respondido com o status indicado."""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class QueryService:
+    """Consultas sobre os grafos de cada período, carregados uma única vez na inicialização.
+    
+    As métricas são calculadas sob demanda para o período e o imposto pedidos e
+    guardadas em um cache LRU de resultados (maxsize entradas). Os cálculos
+    rodam em uma única thread, fora do laço de eventos: as consultas continuam
+    sendo atendidas enquanto uma métrica é calculada, e o GraphCache, que não é
+    seguro entre threads, só é usado por ela.
+    """
+    
+    def __init__(self, df, images_folder=None, resolution='year', community_options=CommunityOptions(seed=0),
+                 maxsize=256):
+        self.graphs = GraphCache(df, resolution=resolution)
+        self.taxes = value_columns(self.graphs.frame)
+        self.periods = {slice_key(periodo): periodo for periodo in self.graphs.years()}
+        self.community_options = community_options
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        
+        # Métricas gravadas pelo pipeline (o arquivo pode ser criado depois que o serviço inicia)
+        self.metrics_path = os.path.join(images_folder, METRICS_FILE) if images_folder else None
+    
+    def period(self, query):
+        """Período pedido no parâmetro 'year'."""
+        valor = query.get('year')
+        if valor is None:
+            raise QueryError("Informe o parâmetro 'year'")
+        if valor not in self.periods:
+            raise QueryError(f"Período desconhecido: {valor!r}", status=404)
+        return self.periods[valor]
+    
+    def columns(self, query):
+        """Coluna (ou grupo de colunas, com 'tax' repetido) pedida; por padrão, DEFAULT_TAX."""
+        colunas = query.get_all('tax') or [DEFAULT_TAX]
+        desconhecidas = [col for col in colunas if col not in self.taxes]
+        if desconhecidas:
+            raise QueryError(f"Imposto desconhecido: {desconhecidas[0]!r}", status=404)
+        return colunas[0] if len(colunas) == 1 else tuple(colunas)
+    
+    def cached(self, key, compute):
+        """Retorna o resultado guardado para a chave, calculando-o (e descartando o mais antigo) se necessário."""
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        
+        resultado = compute()
+        self._results[key] = resultado
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return resultado
+    
+    def centrality(self, periodo, colunas):
+        """Grau de centralidade de cada nó."""
+        G = self.graphs.get(periodo, colunas)
+        return {node: value for _, node, value in centrality_year(G)}
+    
+    def components(self, periodo, colunas):
+        """Número da componente conexa de cada nó."""
+        G = self.graphs.get(periodo, colunas)
+        return {node: int(value) for _, node, value in connected_components_year(G)}
+    
+    def communities(self, periodo, colunas):
+        """Comunidade de cada nó, com as opções de detecção do serviço (reprodutíveis por padrão)."""
+        particao = detect(self.graphs.get(periodo, colunas), self.community_options, label=periodo)
+        return {str(node): comunidade for node, comunidade in particao.items()}
+    
+    def distances(self, periodo, colunas):
+        """Matriz de distâncias entre todos os pares de nós, mantida na memória enquanto estiver no cache."""
+        return DistanceMatrix.compute(self.graphs.get(periodo, colunas))
+    
+    def top(self, periodo, colunas, level, ascending):
+        """Estados (ou regiões) ordenados pela arrecadação, com os totais."""
+        totais = self.graphs.totals(periodo, colunas, level=level)
+        return [(no, float(totais[no])) for no in rank_totals(totais, ascending)]
+    
+    def metric(self, name, query, *extra):
+        """Calcula (ou lê do cache) a métrica name para o período e o imposto da consulta."""
+        periodo, colunas = self.period(query), self.columns(query)
+        return self.cached((name, slice_key(periodo), colunas, *extra),
+                           lambda: getattr(self, name)(periodo, colunas, *extra))
+    
+    def stored_metrics(self, query):
+        """Linhas (etapa, ano, métrica, nó, valor) da tabela de métricas do pipeline, filtradas pela consulta."""
+        if self.metrics_path is None or not os.path.exists(self.metrics_path):
+            raise QueryError("Nenhuma tabela de métricas encontrada (execute o pipeline antes)", status=404)
+        anos = query.get_all('year') or None
+        store = MetricsStore(self.metrics_path)
+        try:
+            return store.read(stage=query.get('stage'), metric=query.get('metric'), years=anos).to_dict('records')
+        finally:
+            store.close()
+    
+    async def run(self, function, *args):
+        """Executa a função na thread de cálculo, sem bloquear o laço de eventos."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+    
+    async def handle(self, path, query):
+        """Responde a uma consulta; retorna o corpo JSON ou um iterador de partes (respostas em blocos)."""
+        if path == '/years':
+            return list(self.periods)
+        if path == '/taxes':
+            return self.taxes
+        if path in ('/centrality', '/components', '/communities'):
+            return await self.run(self.metric, path.lstrip('/'), query)
+        if path == '/top':
+            k = int(query.get('k', 5))
+            level = query.get('level', 'UF')
+            ascending = query.get('order', 'desc') == 'asc'
+            return (await self.run(self.metric, 'top', query, level, ascending))[:k]
+        if path == '/shortest_paths':
+            distancias = await self.run(self.metric, 'distances', query)
+            if 'source' not in query:
+                return stream_matrix(distancias)
+            # Os nós dos períodos não são texto (ex.: o ano 2000); a consulta os identifica pelo rótulo
+            nos = {str(no): no for no in distancias.nodes}
+            if query['source'] not in nos:
+                raise QueryError(f"Nó desconhecido: {query['source']!r}", status=404)
+            origem = nos[query['source']]
+            if 'k' in query:
+                return distancias.nearest(origem, int(query.get('k')))
+            return distancias.row(origem)
+        if path == '/metrics':
+            return stream_list(await self.run(self.stored_metrics, query))
+        raise QueryError(f"Caminho desconhecido: {path}", status=404)
+    
+    def close(self):
+        """Encerra a thread de cálculo."""
+        self._executor.shutdown()
+
+class Query(dict):
+    """Parâmetros da URL: o primeiro valor de cada parâmetro, com todos os valores disponíveis em get_all."""
+    
+    def __init__(self, query_string):
+        self.values = parse_qs(query_string)
+        super().__init__({nome: valores[0] for nome, valores in self.values.items()})
+    
+    def get_all(self, name):
+        """Todos os valores do parâmetro (ex.: 'tax' repetido), na ordem da URL."""
+        return self.values.get(name, [])
+
+def encode(value):
+    """Serializa um valor em JSON (UTF-8), convertendo chaves e valores que não são do JSON em texto."""
+    return json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+
+def stream_list(items):
+    """Partes de uma lista JSON, em blocos de CHUNK_ITEMS itens."""
+    yield b'['
+    for inicio in range(0, len(items), CHUNK_ITEMS):
+        bloco = b','.join(encode(item) for item in items[inicio:inicio + CHUNK_ITEMS])
+        yield bloco if inicio == 0 else b',' + bloco
+    yield b']'
+
+def stream_matrix(distancias):
+    """Partes do JSON {"nodes": [...], "distances": [[...], ...]}, com CHUNK_ITEMS linhas da matriz por parte.
+    
+    A matriz (possivelmente mapeada em memória) é lida aos poucos, sem montar a resposta inteira.
+    """
+    yield b'{"nodes":' + encode(distancias.nodes) + b',"distances":['
+    for inicio in range(0, len(distancias.nodes), CHUNK_ITEMS):
+        bloco = b','.join(encode(linha) for linha in distancias.matrix[inicio:inicio + CHUNK_ITEMS].tolist())
+        yield bloco if inicio == 0 else b',' + bloco
+    yield b']}'
+
+async def send(writer, status, body):
+    """Envia a resposta: com Content-Length para um corpo pronto, ou em blocos para um iterador de partes."""
+    cabecalho = [f'HTTP/1.1 {status} {STATUS[status]}', 'Content-Type: application/json; charset=utf-8',
+                 'Connection: close']
+    
+    if isinstance(body, bytes):
+        writer.write(('\r\n'.join(cabecalho + [f'Content-Length: {len(body)}']) + '\r\n\r\n').encode('ascii') + body)
+    else:
+        writer.write(('\r\n'.join(cabecalho + ['Transfer-Encoding: chunked']) + '\r\n\r\n').encode('ascii'))
+        for parte in body:
+            writer.write(f'{len(parte):X}\r\n'.encode('ascii') + parte + b'\r\n')
+            # Aguarda o cliente consumir cada parte, para que a memória não cresça com respostas grandes
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+async def handle_connection(service, reader, writer):
+    """Atende a uma requisição HTTP (apenas GET) e fecha a conexão."""
+    try:
+        linha = (await reader.readline()).decode('latin1').split()
+        # Descarta os cabeçalhos (as consultas só usam o caminho e os parâmetros)
+        while (await reader.readline()).strip():
+            pass
+        
+        if len(linha) != 3:
+            status, body = 400, encode({'error': 'Requisição inválida'})
+        elif linha[0] != 'GET':
+            status, body = 405, encode({'error': f'Método não permitido: {linha[0]}'})
+        else:
+            url = urlsplit(linha[1])
+            try:
+                resultado = await service.handle(url.path.rstrip('/') or '/', Query(url.query))
+                status, body = 200, resultado if hasattr(resultado, '__next__') else encode(resultado)
+            except QueryError as erro:
+                status, body = erro.status, encode({'error': str(erro)})
+            except (KeyError, ValueError) as erro:
+                status, body = 400, encode({'error': f'{type(erro).__name__}: {erro}'})
+            except Exception as erro:
+                status, body = 500, encode({'error': f'{type(erro).__name__}: {erro}'})
+        
+        await send(writer, status, body)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host='127.0.0.1', port=8000):
+    """Atende às consultas até o processo ser interrompido."""
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer), host, port)
+    enderecos = ', '.join(f'http://{sock.getsockname()[0]}:{sock.getsockname()[1]}' for sock in server.sockets)
+    print(f"API disponível em {enderecos} ({len(service.periods)} período(s), {len(service.taxes)} imposto(s))")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from centrality import centrality_year, render_centrality
+from communities import CommunityOptions, detect_many
+from community_detection import IPI_COLUMNS
+from connected_components import connected_components_year
+from create_graphs import create_bipartite_graph
+from distances import DistanceMatrix
+from graph_builder import GraphCache
+from metrics_store import MetricsStore
+from process_data import load_data, preprocess_data
+from ranking import rank_totals
+from render import RenderOptions
+from similarity import similarity_year
+from synthetic_data import month_count, write_synthetic_csv
+from writer import flush
+
+# Linhas de base versionadas no repositório (o caminho não depende da pasta de onde o comando é executado)
+BASELINE_FILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'baseline.json'))
+
+# Cada etapa recebe o contexto com o arquivo de entrada e os resultados das etapas anteriores
+def _load(ctx):
+    return load_data(ctx['input'])
+
+def _preprocess(ctx):
+    # O pré-processamento altera o DataFrame recebido: cada repetição usa uma cópia
+    return preprocess_data(ctx['load'].copy())
+
+def _preprocess_monthly(ctx):
+    return preprocess_data(ctx['load'].copy(), keep_month=True)
+
+def _bipartite(ctx):
+    return create_bipartite_graph(ctx['preprocess'])
+
+def _graphs(ctx):
+    graphs = GraphCache(ctx['preprocess'])
+    return graphs, [graphs.get(ano, 'IMPOSTO SOBRE IMPORTAÇÃO') for ano in graphs.years()]
+
+def _centrality(ctx):
+    return {ano: centrality_year(G) for ano, G in zip(ctx['graphs'][0].years(), ctx['graphs'][1])}
+
+def _connected_components(ctx):
+    return [connected_components_year(G) for G in ctx['graphs'][1]]
+
+def _shortest_paths(ctx):
+    return [DistanceMatrix.compute(G).matrix.nbytes for G in ctx['graphs'][1]]
+
+def _communities(ctx):
+    graphs = ctx['graphs'][0]
+    grafos = [graphs.get(ano, list(IPI_COLUMNS.values())) for ano in graphs.years()]
+    return detect_many(grafos, CommunityOptions(seed=0))
+
+def _similarity(ctx):
+    graphs = ctx['graphs'][0]
+    return [similarity_year(graphs.year_frame(ano), 'cosine', 5, None, CommunityOptions(seed=0)) for ano in graphs.years()]
+
+def _metrics_write(ctx):
+    store = MetricsStore(os.path.join(ctx['workdir'], 'metrics.sqlite'))
+    store.write('centrality', ctx['centrality'])
+    store.close()
+
+def _render(ctx):
+    # Uma imagem (a do primeiro ano) basta para medir o custo de desenhar um grafo
+    graphs, grafos = ctx['graphs']
+    ano = graphs.years()[0]
+    estados = rank_totals(graphs.totals(ano, 'IMPOSTO SOBRE IMPORTAÇÃO'))
+    image_path = render_centrality(grafos[0], ano, estados, ctx['workdir'], RenderOptions(True, 'png', 100))
+    # A gravação em segundo plano também faz parte do custo medido
+    flush()
+    return image_path
+
+def _calibration(ctx):
+    # Carga fixa, independente dos dados, que mistura laços em Python puro e operações do NumPy, como as etapas
+    matriz = np.random.default_rng(0).random((800, 800))
+    total = sum(i * i for i in range(2_000_000))
+    return total, float(np.sort(matriz @ matriz, axis=None)[-1])
+
+# Etapas medidas, na ordem em que são executadas
+STAGES = {
+    'load': _load,
+    'preprocess': _preprocess,
+    'preprocess_monthly': _preprocess_monthly,
+    'bipartite': _bipartite,
+    'graphs': _graphs,
+    'centrality': _centrality,
+    'connected_components': _connected_components,
+    'shortest_paths': _shortest_paths,
+    'communities': _communities,
+    'similarity': _similarity,
+    'metrics_write': _metrics_write,
+    'render': _render,
+}
+
+# Etapas das quais cada etapa depende (executadas mesmo que não tenham sido pedidas)
+DEPENDENCIES = {
+    'preprocess': ['load'], 'preprocess_monthly': ['load'], 'bipartite': ['preprocess'],
+    'graphs': ['preprocess'], 'centrality': ['graphs'], 'connected_components': ['graphs'],
+    'shortest_paths': ['graphs'], 'communities': ['graphs'], 'similarity': ['graphs'],
+    'metrics_write': ['centrality'], 'render': ['graphs'],
+}
+
+def required_stages(stages):
+    """Completa a lista de etapas pedidas com as suas dependências, na ordem de STAGES."""
+    pendentes, necessarias = list(stages), set()
+    while pendentes:
+        etapa = pendentes.pop()
+        if etapa not in necessarias:
+            necessarias.add(etapa)
+            pendentes.extend(DEPENDENCIES.get(etapa, []))
+    return [etapa for etapa in STAGES if etapa in necessarias]
+
+def measure(function, ctx, repeat=3):
+    """Mede a etapa: menor tempo entre as repetições e pico de memória (tracemalloc) em uma execução à parte.
+    
+    O tracemalloc deixa a execução bem mais lenta, por isso o tempo é medido
+    sem ele. Retorna (resultado, segundos, pico em MB).
+    """
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = function(ctx)
+        tempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    try:
+        function(ctx)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return resultado, min(tempos), pico / 2 ** 20
+
+def run_benchmarks(input_file, stages=tuple(STAGES), repeat=3):
+    """Executa as etapas sobre o arquivo bruto e retorna {etapa: {'seconds': ..., 'peak_mb': ...}}."""
+    resultados = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = {'input': input_file, 'workdir': workdir}
+        for etapa in required_stages(stages):
+            ctx[etapa], segundos, pico = measure(STAGES[etapa], ctx, repeat)
+            if etapa in stages:
+                resultados[etapa] = {'seconds': round(segundos, 4), 'peak_mb': round(pico, 2)}
+                print(f"{etapa:<22} {segundos:>10.4f} s {pico:>10.2f} MB")
+    return resultados
+
+def calibrate(repeat=3):
+    """Tempo da carga fixa de referência, que mede a velocidade da máquina (e do Python) em que o benchmark roda."""
+    _, segundos, _ = measure(_calibration, {}, repeat)
+    return round(segundos, 4)
+
+def scale_key(years, months, entities, taxes):
+    """Identifica a escala dos dados sintéticos nas linhas de base."""
+    return f'{years}a-{months}m-{entities}e-{taxes}i'
+
+def find_regressions(results, baseline, tolerance=0.25, min_seconds=0.01, min_mb=1.0, speed=1.0):
+    """Compara os resultados com a linha de base e retorna as regressões como mensagens.
+    
+    Uma etapa regride quando fica mais de tolerance (fração) acima da linha de
+    base; diferenças absolutas menores que min_seconds e min_mb são ruído.
+    Os tempos da linha de base são multiplicados por speed, a razão entre a
+    calibração desta máquina e a da máquina em que a linha de base foi gravada.
+    """
+    regressoes = []
+    for etapa, atual in results.items():
+        base = baseline.get(etapa)
+        if base is None:
+            continue
+        for medida, minimo in (('seconds', min_seconds), ('peak_mb', min_mb)):
+            esperado = base[medida] * speed if medida == 'seconds' else base[medida]
+            if atual[medida] > esperado * (1 + tolerance) and atual[medida] - esperado > minimo:
+                regressoes.append(f"{etapa}: {medida} {esperado:.4g} -> {atual[medida]}")
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo e o pico de memória de cada etapa sobre dados sintéticos.")
+    parser.add_argument('--years', type=int, default=25)
+    parser.add_argument('--months', type=month_count, default=12, help="meses por ano (1 a 12)")
+    parser.add_argument('--entities', type=int, default=27, help="27 = estados; 5570 ≈ municípios")
+    parser.add_argument('--taxes', type=int, default=45)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+                        help="etapas a medir (padrão: todas)")
+    parser.add_argument('--repeat', type=int, default=3, help="repetições de cada etapa (vale o menor tempo)")
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help="arquivo JSON com as linhas de base, por escala (padrão: benchmarks/baseline.json do repositório)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="grava os resultados como a nova linha de base desta escala")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="aumento relativo tolerado antes de acusar uma regressão")
+    args = parser.parse_args(argv)
+    
+    escala = scale_key(args.years, args.months, args.entities, args.taxes)
+    with tempfile.TemporaryDirectory() as pasta:
+        input_file = write_synthetic_csv(os.path.join(pasta, 'arrecadacao-sintetica.csv'), years=args.years,
+                                         months=args.months, entities=args.entities, taxes=args.taxes)
+        print(f"Escala {escala}")
+        resultados = run_benchmarks(input_file, args.stages, args.repeat)
+    
+    # Os tempos absolutos dependem da máquina: a calibração permite comparar com uma linha de base gravada em outra
+    calibracao = calibrate(args.repeat)
+    print(f"{'calibration':<22} {calibracao:>10.4f} s")
+    
+    linhas_de_base = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            linhas_de_base = json.load(f)
+    
+    if args.save_baseline:
+        linhas_de_base[escala] = {**linhas_de_base.get(escala, {}), **resultados, 'calibration': {'seconds': calibracao}}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(linhas_de_base, f, indent=2)
+        print(f"Linha de base salva em {args.baseline}")
+        return 0
+    
+    if escala not in linhas_de_base:
+        print(f"Sem linha de base para a escala {escala} (use --save-baseline)")
+        return 0
+    
+    # Linhas de base sem calibração (gravadas antes dela) são comparadas como tempos absolutos
+    base = linhas_de_base[escala]
+    speed = calibracao / base['calibration']['seconds'] if 'calibration' in base else 1.0
+    print(f"Velocidade relativa à máquina da linha de base: {speed:.2f}x o tempo")
+    
+    regressoes = find_regressions(resultados, base, args.tolerance, speed=speed)
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}")
+    if not regressoes:
+        print("Nenhuma regressão em relação à linha de base.")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
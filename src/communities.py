@@ -0,0 +1,89 @@
+from collections import namedtuple
+
+import networkx as nx
+
+from parallel import run_years
+
+# Algoritmos de detecção de comunidades disponíveis
+METHODS = ('louvain', 'label_propagation')
+
+# Opções da detecção de comunidades: algoritmo, semente (None = não reprodutível) e número de reinícios
+CommunityOptions = namedtuple('CommunityOptions', ['method', 'seed', 'restarts'], defaults=['louvain', None, 1])
+
+def prepare_graph(G, partition=None):
+    """Prepara uma cópia do grafo para a detecção; retorna (grafo, atributo de peso).
+    
+    Pesos negativos (estornos, comuns nos dados mensais) são limitados a zero.
+    Sem nenhum peso positivo, as arestas são tratadas como não ponderadas (um
+    atributo inexistente faz os algoritmos usarem peso 1 em todas). Com partição
+    inicial, o Louvain rejeita arestas de peso zero, que não alteram a
+    modularidade; elas são removidas.
+    """
+    H = G.copy()
+    nx.set_edge_attributes(H, {(u, v): max(w, 0.0) for u, v, w in G.edges(data='weight')}, 'weight')
+    
+    peso = 'weight' if H.size(weight='weight') > 0 else 'sem_peso'
+    if partition is not None and peso == 'weight':
+        H.remove_edges_from([(u, v) for u, v, w in H.edges(data='weight') if w <= 0])
+    
+    return H, peso
+
+def restart_seeds(seed, restarts):
+    """Sementes de cada reinício, derivadas da semente principal (None mantém os reinícios aleatórios)."""
+    if restarts < 1:
+        raise ValueError(f"O número de reinícios deve ser pelo menos 1 (recebido: {restarts})")
+    return [None if seed is None else seed + i for i in range(restarts)]
+
+def run_once(G, method='louvain', seed=None, partition=None):
+    """Executa o algoritmo uma vez; retorna (partição, modularidade).
+    
+    A partição inicial só é usada pelo Louvain, como ponto de partida (os nós
+    ainda podem mudar de comunidade); a propagação de rótulos sempre parte de
+    rótulos individuais.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Algoritmo desconhecido: {method!r} (use um de {METHODS})")
+    
+    # O python-louvain (também usado para a modularidade) só é carregado quando há comunidades a detectar
+    from community import community_louvain
+    
+    H, peso = prepare_graph(G, partition if method == 'louvain' else None)
+    
+    # Sem arestas a modularidade é indefinida: cada nó é a sua própria comunidade
+    if H.number_of_edges() == 0:
+        return {node: i for i, node in enumerate(H)}, 0.0
+    
+    if method == 'louvain':
+        particao = community_louvain.best_partition(H, partition=partition, weight=peso, random_state=seed)
+    else:
+        grupos = nx.community.fast_label_propagation_communities(H, weight=peso, seed=seed)
+        particao = {node: i for i, grupo in enumerate(grupos) for node in grupo}
+    
+    return particao, community_louvain.modularity(particao, H, weight=peso)
+
+def best_of(results):
+    """Escolhe a partição de maior modularidade (a do primeiro reinício, em caso de empate)."""
+    particao, _ = max(results, key=lambda resultado: resultado[1])
+    
+    # Numera as comunidades pela ordem em que aparecem, para que a saída seja estável
+    numeros = {}
+    return {node: numeros.setdefault(comunidade, len(numeros)) for node, comunidade in particao.items()}
+
+def detect(G, options=CommunityOptions(), partition=None, workers=1, label=None):
+    """Detecta as comunidades de um grafo, com options.restarts reinícios em paralelo; retorna a melhor partição.
+    
+    label identifica o grafo (em geral, o período) nos registros da instrumentação.
+    """
+    sementes = restart_seeds(options.seed, options.restarts)
+    tarefas = [(G, options.method, seed, partition) for seed in sementes]
+    return best_of(run_years(run_once, tarefas, workers, labels=[f'{label}#{i}' for i in range(len(sementes))]))
+
+def detect_many(graphs, options=CommunityOptions(), workers=1, labels=None):
+    """Detecta as comunidades de vários grafos, distribuindo todos os pares (grafo, reinício) entre os processos."""
+    sementes = restart_seeds(options.seed, options.restarts)
+    tarefas = [(G, options.method, seed) for G in graphs for seed in sementes]
+    rotulos = [f'{label}#{i}' for label in (labels or range(len(graphs))) for i in range(len(sementes))]
+    resultados = run_years(run_once, tarefas, workers, labels=rotulos)
+    
+    n = len(sementes)
+    return [best_of(resultados[i:i + n]) for i in range(0, len(resultados), n)]
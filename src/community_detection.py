@@ -1,118 +1,93 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
 import os
-from community import community_louvain  # Biblioteca para detecção de comunidades
 
-def detect_communities(df, output_folder):
-    """Detecta comunidades na rede e salva os resultados."""
-    anos = df['Ano'].unique()
+from communities import CommunityOptions, detect, detect_many
+from graph_builder import GraphCache
+from layouts import cached_layout
+from metrics_store import METRICS_FILE, MetricsStore, metric_rows
+from parallel import run_years
+from process_data import load_processed_data
+from ranking import rank_totals
+from render import RenderOptions, dominant_colors, draw_weighted_graph
+
+# Colunas de IPI usadas na detecção de comunidades (atributo do nó -> coluna)
+IPI_COLUMNS = {
+    'ipi_fumo': 'IPI - FUMO',
+    'ipi_bebidas': 'IPI - BEBIDAS',
+    'ipi_automoveis': 'IPI - AUTOMÓVEIS',
+    'ipi_outros': 'IPI - OUTROS',
+}
+IPI_ATTRIBUTES = {'total_ipi': list(IPI_COLUMNS.values()), **IPI_COLUMNS}
+
+# Cor de cada estado conforme o tipo de IPI predominante: fumo, bebidas, automóveis, outros
+IPI_COLORS = ['red', 'blue', 'green', 'orange']
+
+def communities_year(G, community_options=CommunityOptions()):
+    """Detecta as comunidades de um ano; retorna as linhas (métrica, nó, valor), com o número da comunidade como valor."""
+    return metric_rows('community', detect(G, community_options))
+
+def render_communities(G, ano, estados_ordenados, output_folder, render_options):
+    """Gera a visualização gráfica do grafo de comunidades de um ano."""
+    # Posições em espiral, calculadas uma vez por conjunto de estados e reaproveitadas entre os anos
+    pos = cached_layout(G, 'spiral', anchor=ano, folder=output_folder)
+    
+    # Cores dos estados pelo maior valor de IPI (o nó do ano não é desenhado)
+    cores = dominant_colors(G, estados_ordenados, list(IPI_COLUMNS), IPI_COLORS)
+    
+    return draw_weighted_graph(
+        G, pos, f"Comunidades Detectadas no Ano {ano}",
+        [(estado, ano) for estado in estados_ordenados],
+        output_folder, f'communities_graph_{ano}', render_options,
+        nodelist=estados_ordenados, node_color=cores, edge_label_color='black'
+    )
+
+def detect_communities(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                       metrics=None, community_options=CommunityOptions()):
+    """Detecta comunidades na rede e salva os resultados; retorna as imagens geradas por ano.
+    
+    Os reinícios de todos os anos (community_options.restarts por ano) são
+    distribuídos juntos entre os processos, e cada ano fica com a partição de
+    maior modularidade.
+    """
+    # Sem um cache compartilhado pelo pipeline, os grafos são construídos aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    # Anos a processar (por padrão, todos)
+    anos = graphs.years() if years is None else list(years)
+    
+    # Os grafos são obtidos no processo principal, pois o cache não é compartilhado entre processos
+    # (peso = total de IPI, com cada tipo de IPI como atributo dos estados)
+    grafos = [graphs.get(ano, list(IPI_COLUMNS.values()), node_columns=IPI_ATTRIBUTES) for ano in anos]
+    
+    # Calcula as métricas (em paralelo se workers > 1) e as grava de uma só vez na tabela de métricas
+    particoes = detect_many(grafos, community_options, workers, labels=anos)
+    metrics.write('communities', {ano: metric_rows('community', particao) for ano, particao in zip(anos, particoes)})
+    print(f"Comunidades detectadas de {len(anos)} ano(s) salvas em {metrics.path}")
+    
+    # Os arquivos gerados por ano passam a ser apenas as imagens
+    artefatos = {ano: [] for ano in anos}
+    
+    # Etapa de renderização, separada do cálculo das métricas
+    if render_options.enabled:
+        tarefas = [
+            (G, ano, rank_totals(graphs.totals(ano, list(IPI_COLUMNS.values()))), output_folder, render_options)
+            for G, ano in zip(grafos, anos)
+        ]
+        for ano, image_path in zip(anos, run_years(render_communities, tarefas, workers, labels=anos)):
+            artefatos[ano].append(image_path)
+            print(f"Visualização das comunidades no ano {ano} salva em {image_path}")
     
-    for ano in anos:
-        df_ano = df[df['Ano'] == ano]
-        G = nx.Graph()
-        
-        # Adiciona nós e arestas ao grafo
-        for _, row in df_ano.iterrows():
-            estado = row['UF']
-            ipi_fumo = row['IPI - FUMO']
-            ipi_bebidas = row['IPI - BEBIDAS']
-            ipi_automoveis = row['IPI - AUTOMÓVEIS']  # Nome corrigido
-            ipi_outros = row['IPI - OUTROS']
-            
-            # Soma os valores de IPI para o estado
-            total_ipi = ipi_fumo + ipi_bebidas + ipi_automoveis + ipi_outros
-            
-            # Adiciona o nó do estado com o total de IPI
-            G.add_node(estado, bipartite=0, total_ipi=total_ipi, ipi_fumo=ipi_fumo, ipi_bebidas=ipi_bebidas, ipi_automoveis=ipi_automoveis, ipi_outros=ipi_outros)
-            G.add_node(ano, bipartite=1)
-            G.add_edge(estado, ano, weight=total_ipi)
-        
-        # Ordena os estados por total de IPI (decrescente)
-        estados_ordenados = sorted(df_ano['UF'], key=lambda x: df_ano[df_ano['UF'] == x]['IMPOSTO SOBRE IMPORTAÇÃO'].values[0], reverse=True)
-        
-        # Define posições dos nós em espiral
-        pos = nx.spiral_layout(G)  # Layout em espiral
-        
-        # Detecta comunidades usando o algoritmo de Louvain
-        partition = community_louvain.best_partition(G)
-        
-        # Salva os resultados em um arquivo de texto
-        output_path = os.path.join(output_folder, f'communities_{ano}.txt')
-        with open(output_path, 'w') as f:
-            f.write(f"Comunidades Detectadas no Ano {ano}:\n")
-            for node, community_id in partition.items():
-                f.write(f"{node}: Comunidade {community_id}\n")
-        
-        # Gera uma visualização gráfica do grafo
-        plt.figure(figsize=(12, 8))
-        
-        # Desenha os nós com cores diferentes para cada tipo de IPI
-        for estado in G.nodes:
-            if estado != ano:  # Ignora o nó do ano
-                ipi_fumo = G.nodes[estado]['ipi_fumo']
-                ipi_bebidas = G.nodes[estado]['ipi_bebidas']
-                ipi_automoveis = G.nodes[estado]['ipi_automoveis']
-                ipi_outros = G.nodes[estado]['ipi_outros']
-                
-                # Define a cor com base no maior valor de IPI
-                max_ipi = max(ipi_fumo, ipi_bebidas, ipi_automoveis, ipi_outros)
-                if max_ipi == ipi_fumo:
-                    color = 'red'  # Fumo
-                elif max_ipi == ipi_bebidas:
-                    color = 'blue'  # Bebidas
-                elif max_ipi == ipi_automoveis:
-                    color = 'green'  # Automóveis
-                else:
-                    color = 'orange'  # Outros
-                
-                nx.draw_networkx_nodes(
-                    G, pos,
-                    nodelist=[estado],
-                    node_size=1000,
-                    node_color=color,
-                    alpha=0.8
-                )
-        
-        # Desenha as arestas
-        edges = nx.draw_networkx_edges(
-            G, pos,
-            width=1.0,
-            edge_color='gray',
-            alpha=0.5
-        )
-        
-        # Desenha os rótulos das arestas
-        edge_labels = {(estado, ano): f"{G.edges[estado, ano]['weight']:.2f}" for estado in estados_ordenados}
-        nx.draw_networkx_edge_labels(
-            G, pos,
-            edge_labels=edge_labels,
-            font_size=8,
-            font_color='black',
-            bbox=dict(facecolor='white', edgecolor='none', alpha=0.7)  # Fundo branco para melhor legibilidade
-        )
-        
-        # Desenha os rótulos dos nós
-        nx.draw_networkx_labels(
-            G, pos,
-            font_size=10,
-            font_weight='bold',
-            font_color='black'
-        )
-        
-        # Adiciona título e remove eixos
-        plt.title(f"Comunidades Detectadas no Ano {ano}", fontsize=16)
-        plt.axis('off')  # Remove os eixos
-        
-        # Salva a imagem
-        plt.savefig(os.path.join(output_folder, f'communities_graph_{ano}.png'), bbox_inches='tight', dpi=300)
-        plt.close()
-        
-        print(f"Comunidades detectadas no ano {ano} salvas em {output_path} e visualização salva em {output_folder}/communities_graph_{ano}.png")
+    return artefatos
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
-    processed_file = 'C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv'
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
     output_folder = 'C:/Users/Mateus/ProjetoReceita/images/community_detection'
     
     # Verifica se a pasta de saída existe, caso contrário, cria-a
@@ -120,7 +95,7 @@ if __name__ == "__main__":
         os.makedirs(output_folder)
     
     # Carrega os dados processados
-    df = pd.read_csv(processed_file)
+    df = load_processed_data(input_file)
     
     # Verifica os nomes das colunas no DataFrame
     print("Colunas disponíveis no DataFrame:", df.columns)
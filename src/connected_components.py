@@ -1,93 +1,74 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
 import os
 
-def find_connected_components(df, output_folder):
-    """Identifica componentes conexas na rede e salva os resultados."""
-    anos = df['Ano'].unique()
+from graph_builder import GraphCache
+from layouts import star_layout
+from metrics_store import METRICS_FILE, MetricsStore, metric_rows
+from parallel import run_years
+from process_data import load_processed_data
+from ranking import rank_totals
+from render import RenderOptions, draw_weighted_graph
+
+def connected_components_year(G):
+    """Identifica as componentes conexas de um ano; retorna as linhas (métrica, nó, valor).
+    
+    O valor de cada nó é o número (a partir de 1) da componente a que pertence.
+    """
+    componentes = {node: i + 1 for i, component in enumerate(nx.connected_components(G)) for node in component}
+    return metric_rows('component', componentes)
+
+def render_connected_components(G, ano, estados_ordenados, output_folder, render_options):
+    """Gera a visualização gráfica do grafo de componentes conexas de um ano."""
+    # Ano no centro e estados à direita, ordenados
+    pos = star_layout(ano, estados_ordenados)
+    
+    return draw_weighted_graph(
+        G, pos, f"Componentes Conexas no Ano {ano}",
+        [(estado, ano) for estado in estados_ordenados],
+        output_folder, f'connected_components_graph_{ano}', render_options
+    )
+
+def find_connected_components(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                              metrics=None):
+    """Identifica componentes conexas na rede e salva os resultados; retorna as imagens geradas por ano."""
+    # Sem um cache compartilhado pelo pipeline, os grafos são construídos aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    # Anos a processar (por padrão, todos)
+    anos = graphs.years() if years is None else list(years)
+    
+    # Os grafos são obtidos no processo principal, pois o cache não é compartilhado entre processos
+    grafos = [graphs.get(ano, 'IMPOSTO SOBRE IMPORTAÇÃO') for ano in anos]
+    
+    # Calcula as métricas (em paralelo se workers > 1) e as grava de uma só vez na tabela de métricas
+    linhas = run_years(connected_components_year, [(G,) for G in grafos], workers, labels=anos)
+    metrics.write('connected_components', dict(zip(anos, linhas)))
+    print(f"Componentes conexas de {len(anos)} ano(s) salvas em {metrics.path}")
+    
+    # Os arquivos gerados por ano passam a ser apenas as imagens
+    artefatos = {ano: [] for ano in anos}
+    
+    # Etapa de renderização, separada do cálculo das métricas
+    if render_options.enabled:
+        tarefas = [
+            (G, ano, rank_totals(graphs.totals(ano, 'IMPOSTO SOBRE IMPORTAÇÃO')), output_folder, render_options)
+            for G, ano in zip(grafos, anos)
+        ]
+        for ano, image_path in zip(anos, run_years(render_connected_components, tarefas, workers, labels=anos)):
+            artefatos[ano].append(image_path)
+            print(f"Visualização das componentes conexas no ano {ano} salva em {image_path}")
     
-    for ano in anos:
-        df_ano = df[df['Ano'] == ano]
-        G = nx.Graph()
-        
-        # Adiciona nós e arestas ao grafo
-        for _, row in df_ano.iterrows():
-            estado = row['UF']
-            arrecadacao = row['IMPOSTO SOBRE IMPORTAÇÃO']
-            G.add_node(estado, bipartite=0)
-            G.add_node(ano, bipartite=1)
-            G.add_edge(estado, ano, weight=arrecadacao)
-        
-        # Ordena os estados por valor de imposto sobre importação (decrescente)
-        estados_ordenados = sorted(df_ano['UF'], key=lambda x: df_ano[df_ano['UF'] == x]['IMPOSTO SOBRE IMPORTAÇÃO'].values[0], reverse=True)
-        
-        # Define posições dos nós manualmente
-        pos = {}
-        pos[ano] = (0, 0)  # Ano no centro
-        for i, estado in enumerate(estados_ordenados):
-            pos[estado] = (1, i)  # Estados à direita, ordenados
-        
-        # Encontra as componentes conexas
-        components = list(nx.connected_components(G))
-        
-        # Salva os resultados em um arquivo de texto
-        output_path = os.path.join(output_folder, f'connected_components_{ano}.txt')
-        with open(output_path, 'w') as f:
-            f.write(f"Componentes Conexas no Ano {ano}:\n")
-            for i, component in enumerate(components):
-                f.write(f"Componente {i + 1}: {component}\n")
-        
-        # Gera uma visualização gráfica do grafo
-        plt.figure(figsize=(12, 8))
-        
-        # Desenha os nós
-        nx.draw_networkx_nodes(
-            G, pos,
-            node_size=1000,
-            node_color='skyblue',
-            alpha=0.8
-        )
-        
-        # Desenha as arestas
-        edges = nx.draw_networkx_edges(
-            G, pos,
-            width=1.0,
-            edge_color='gray',
-            alpha=0.5
-        )
-        
-        # Desenha os rótulos das arestas
-        edge_labels = {(estado, ano): f"{G.edges[estado, ano]['weight']:.2f}" for estado in estados_ordenados}
-        nx.draw_networkx_edge_labels(
-            G, pos,
-            edge_labels=edge_labels,
-            font_size=8,
-            font_color='red',
-            bbox=dict(facecolor='white', edgecolor='none', alpha=0.7)  # Fundo branco para melhor legibilidade
-        )
-        
-        # Desenha os rótulos dos nós
-        nx.draw_networkx_labels(
-            G, pos,
-            font_size=10,
-            font_weight='bold',
-            font_color='black'
-        )
-        
-        # Adiciona título e remove eixos
-        plt.title(f"Componentes Conexas no Ano {ano}", fontsize=16)
-        plt.axis('off')  # Remove os eixos
-        
-        # Salva a imagem
-        plt.savefig(os.path.join(output_folder, f'connected_components_graph_{ano}.png'), bbox_inches='tight', dpi=300)
-        plt.close()
-        
-        print(f"Componentes conexas no ano {ano} salvas em {output_path} e visualização salva em {output_folder}/connected_components_graph_{ano}.png")
+    return artefatos
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
-    processed_file = 'C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv'
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
     output_folder = 'C:/Users/Mateus/ProjetoReceita/images/connected_components_analysis'
     
     # Verifica se a pasta de saída existe, caso contrário, cria-a
@@ -95,7 +76,7 @@ if __name__ == "__main__":
         os.makedirs(output_folder)
     
     # Carrega os dados processados
-    df = pd.read_csv(processed_file)
+    df = load_processed_data(input_file)
     
     # Realiza a análise de componentes conexas
     find_connected_components(df, output_folder)
@@ -1,55 +1,54 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
+import os
+
+from graph_builder import build_bipartite_graph, value_columns
+from layouts import cached_layout
+from process_data import load_processed_data
+from render import RenderOptions, get_renderer
 
 def create_bipartite_graph(df):
     """Cria um grafo bipartido a partir dos dados."""
-    G = nx.Graph()
-    
-    # Adiciona nós para estados e anos
-    estados = df['UF'].unique()
-    anos = df['Ano'].unique()
-    
-    G.add_nodes_from(estados, bipartite=0)
-    G.add_nodes_from(anos, bipartite=1)
-    
-    # Adiciona arestas com pesos baseados na arrecadação total
-    for _, row in df.iterrows():
-        estado = row['UF']
-        ano = row['Ano']
-        arrecadacao_total = row.iloc[2:].sum()
-        G.add_edge(estado, ano, weight=arrecadacao_total)
-    
-    return G
+    # Arestas com pesos baseados na arrecadação total (soma de todas as colunas de valores)
+    return build_bipartite_graph(df, value_columns(df))
 
-def draw_graph(G, output_path):
-    """Desenha o grafo e salva a imagem."""
-    pos = nx.spring_layout(G)
-    plt.figure(figsize=(12, 8))
+def draw_graph(G, output_folder, render_options=RenderOptions(), name='bipartite_graph'):
+    """Desenha o grafo e salva a imagem no formato e na resolução de render_options; retorna o caminho (None sem renderização)."""
+    # Com --no-render nada é desenhado (nem o matplotlib é carregado)
+    if not render_options.enabled:
+        return None
+    
+    # Layout de molas com semente fixa, salvo ao lado da imagem e reaproveitado enquanto os nós forem os mesmos
+    pos = cached_layout(G, 'spring', folder=output_folder)
+    renderer = get_renderer(render_options)
+    ax = renderer.start('')
     
     # Define cores para os nós
     color_map = []
     for node in G.nodes():
-        if G.nodes[node]['bipartite'] == 0:
+        if G.nodes[node].get('anomalo'):
+            color_map.append('red')  # Estados com anomalias ou mudanças de patamar (ver anomalies.mark_anomalies)
+        elif G.nodes[node]['bipartite'] == 0:
             color_map.append('blue')  # Estados
         else:
             color_map.append('green')  # Anos
     
-    nx.draw(G, pos, node_color=color_map, with_labels=True, node_size=2000, font_size=10, font_weight='bold')
-    plt.savefig(output_path)
-    plt.close()
+    nx.draw(G, pos, ax=ax, node_color=color_map, with_labels=True, node_size=2000, font_size=10, font_weight='bold')
+    
+    # Renderiza em memória e deixa a gravação para o escritor em segundo plano
+    return renderer.save(output_folder, name)
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
     input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
-    output_image = 'C:/Users/Mateus/ProjetoReceita/images/bipartite_graph.png'
+    output_folder = 'C:/Users/Mateus/ProjetoReceita/images'
     
     # Carrega os dados processados
-    df = pd.read_csv(input_file)
+    df = load_processed_data(input_file)
     
     # Cria o grafo bipartido
     G = create_bipartite_graph(df)
     
     # Desenha e salva o grafo
-    draw_graph(G, output_image)
-    print("Grafo bipartido gerado e salvo com sucesso!")
\ No newline at end of file
+    output_image = draw_graph(G, output_folder)
+    print(f"Grafo bipartido gerado e salvo em {output_image}")
\ No newline at end of file
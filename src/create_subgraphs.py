@@ -1,71 +1,111 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
 import os
 
-def create_subgraphs(df, output_folder):
-    """Cria subgrafos para cada ano e salva as imagens."""
-    anos = df['Ano'].unique()
+from graph_builder import GraphCache
+from layouts import cached_layout
+from parallel import run_years
+from process_data import load_processed_data
+from ranking import bottom_k, rank_totals, top_k
+from render import RenderOptions, get_renderer
+
+def draw_subgraph(G, ano, estados, title, output_folder, name, render_options, label='Estados'):
+    """Desenha o subgrafo estado-ano (ou região-ano) com os nós indicados e salva a imagem."""
+    H = G.subgraph(list(estados) + [ano])
+    
+    # Layout bipartido, calculado uma vez por conjunto de nós e reaproveitado entre os anos
+    pos = cached_layout(H, 'bipartite', anchor=ano, folder=output_folder)
+    
+    # Ajusta a posição dos nós para centralizar o ano
+    pos[ano] = (0.5, 0.5)  # Centraliza o nó do ano
+    
+    # Reaproveita a figura do processo, já com título e sem eixos
+    renderer = get_renderer(render_options)
+    ax = renderer.start(title)
+    
+    # Desenha os nós dos estados
+    nx.draw_networkx_nodes(H, pos, nodelist=estados, node_size=3000, node_color='skyblue', label=label, ax=ax)
+    
+    # Desenha o nó do ano
+    nx.draw_networkx_nodes(H, pos, nodelist=[ano], node_size=5000, node_color='orange', label='Ano', ax=ax)
+    
+    # Desenha as arestas
+    nx.draw_networkx_edges(H, pos, width=1.5, alpha=0.6, ax=ax)
+    
+    # Desenha os rótulos
+    nx.draw_networkx_labels(H, pos, font_size=10, font_weight='bold', ax=ax)
+    
+    # Adiciona a legenda
+    ax.legend(scatterpoints=1, frameon=False, fontsize=12)
+    
+    # Salva a imagem
+    return renderer.save(output_folder, name)
+
+def subgraphs_year(G, ano, estados_ordenados, output_folder, extremos, render_options, G_regioes=None):
+    """Desenha o subgrafo de um ano, o das regiões (com G_regioes) e, com extremos, os dos estados de maior e menor arrecadação.
+    
+    extremos é o par (maiores, menores) de listas de estados, ou None.
+    """
+    output_paths = [draw_subgraph(G, ano, estados_ordenados, f'Arrecadação por Estado no Ano {ano}',
+                                  output_folder, f'subgraph_{ano}', render_options)]
+    
+    # Subgrafo das regiões, com a arrecadação dos estados somada por região
+    if G_regioes is not None:
+        regioes = [no for no in G_regioes if no != ano]
+        output_paths.append(draw_subgraph(G_regioes, ano, regioes, f'Arrecadação por Região no Ano {ano}',
+                                          output_folder, f'subgraph_regioes_{ano}', render_options, label='Regiões'))
+    
+    # Subgrafos dos estados com maior e menor arrecadação
+    if extremos:
+        maiores, menores = extremos
+        output_paths.append(draw_subgraph(G, ano, maiores, f'{len(maiores)} Estados com Maior Arrecadação no Ano {ano}',
+                                          output_folder, f'subgraph_maiores_{ano}', render_options))
+        output_paths.append(draw_subgraph(G, ano, menores, f'{len(menores)} Estados com Menor Arrecadação no Ano {ano}',
+                                          output_folder, f'subgraph_menores_{ano}', render_options))
+    
+    return output_paths
+
+def create_subgraphs(df, output_folder, graphs=None, k=5, workers=1, render_options=RenderOptions(), years=None,
+                     metrics=None):
+    """Cria os subgrafos de cada ano (todos os estados, as regiões e os k extremos) e retorna as imagens geradas por ano.
+    
+    Rankings e pesos vêm do cubo pré-agregado do GraphCache, sem filtrar os dados de cada ano.
+    """
+    # Sem um cache compartilhado pelo pipeline, os grafos são construídos aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    anos = graphs.years() if years is None else list(years)
+    
+    # Esta etapa só produz imagens: sem renderização, os anos são registrados sem arquivos
+    if not render_options.enabled:
+        return {ano: [] for ano in anos}
     
     # Verifica se a pasta de saída existe, caso contrário, cria-a
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
+    # Os grafos são obtidos no processo principal, pois o cache não é compartilhado entre processos
+    tarefas = []
     for ano in anos:
-        df_ano = df[df['Ano'] == ano]
-        
-        # Ordena os estados por arrecadação (IMPOSTO SOBRE IMPORTAÇÃO) em ordem decrescente
-        df_ano = df_ano.sort_values(by='IMPOSTO SOBRE IMPORTAÇÃO', ascending=False)
-        
-        G = nx.Graph()
-        
-        for _, row in df_ano.iterrows():
-            estado = row['UF']
-            arrecadacao = row['IMPOSTO SOBRE IMPORTAÇÃO']
-            G.add_node(estado, bipartite=0)
-            G.add_node(ano, bipartite=1)
-            G.add_edge(estado, ano, weight=arrecadacao)
-        
-        # Define o layout bipartido
-        pos = nx.bipartite_layout(G, nodes=[ano], align='vertical')
-        
-        # Ajusta a posição dos nós para centralizar o ano
-        pos[ano] = (0.5, 0.5)  # Centraliza o nó do ano
-        
-        # Desenha o grafo
-        plt.figure(figsize=(12, 8))
+        # Ordena os estados por arrecadação (IMPOSTO SOBRE IMPORTAÇÃO) em ordem decrescente, e separa os k extremos
+        totais = graphs.totals(ano, 'IMPOSTO SOBRE IMPORTAÇÃO')
+        estados_ordenados = rank_totals(totais)
+        extremos = (top_k(totais, k), bottom_k(totais, k)) if k else None
         
-        # Desenha os nós dos estados
-        nx.draw_networkx_nodes(G, pos, nodelist=df_ano['UF'].unique(), node_size=3000, node_color='skyblue', label='Estados')
-        
-        # Desenha o nó do ano
-        nx.draw_networkx_nodes(G, pos, nodelist=[ano], node_size=5000, node_color='orange', label='Ano')
-        
-        # Desenha as arestas
-        nx.draw_networkx_edges(G, pos, width=1.5, alpha=0.6)
-        
-        # Desenha os rótulos
-        nx.draw_networkx_labels(G, pos, font_size=10, font_weight='bold')
-        
-        # Adiciona título e legenda
-        plt.title(f'Arrecadação por Estado no Ano {ano}', fontsize=16)
-        plt.legend(scatterpoints=1, frameon=False, fontsize=12)
-        
-        # Remove eixos
-        plt.axis('off')
-        
-        # Salva a imagem
-        output_path = os.path.join(output_folder, f'subgraph_{ano}.png')
-        plt.savefig(output_path, bbox_inches='tight', dpi=300)
-        plt.close()
+        G = graphs.get(ano, 'IMPOSTO SOBRE IMPORTAÇÃO')
+        G_regioes = graphs.get(ano, 'IMPOSTO SOBRE IMPORTAÇÃO', level='Região')
+        tarefas.append((G, ano, estados_ordenados, output_folder, extremos, render_options, G_regioes))
+    
+    # Desenha os anos (em paralelo se workers > 1)
+    return dict(zip(anos, run_years(subgraphs_year, tarefas, workers, labels=anos)))
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
-    processed_file = 'C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv'
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
     output_folder = 'C:/Users/Mateus/ProjetoReceita/images/subgraphs'
     
     # Carrega os dados processados
-    df = pd.read_csv(processed_file)
+    df = load_processed_data(input_file)
     
     # Cria e salva os subgrafos
     create_subgraphs(df, output_folder)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Regiões do Brasil e os estados de cada uma
+REGIONS = {
+    'Norte': ['AC', 'AM', 'AP', 'PA', 'RO', 'RR', 'TO'],
+    'Nordeste': ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE'],
+    'Centro-Oeste': ['DF', 'GO', 'MS', 'MT'],
+    'Sudeste': ['ES', 'MG', 'RJ', 'SP'],
+    'Sul': ['PR', 'RS', 'SC'],
+}
+STATE_REGION = {uf: regiao for regiao, estados in REGIONS.items() for uf in estados}
+
+# Região das entidades que não são estados (ex.: códigos de municípios ou linhas agregadas do arquivo)
+OTHER_REGION = 'Outros'
+
+# Níveis de agregação geográfica do cubo
+LEVELS = ('UF', 'Região')
+
+# Colunas que identificam uma linha (as demais são valores de arrecadação); graph_builder usa a mesma definição
+KEY_COLUMNS = ('Ano', 'Mês', 'UF', 'Periodo')
+
+class RevenueCube:
+    """Cubo de arrecadação pré-agregado (Ano × Mês × UF × imposto) em um array denso do NumPy.
+    
+    Os índices de cada eixo ficam em dicionários (ano -> posição, estado ->
+    posição, coluna -> posição), de modo que o recorte de um ano ou de um imposto
+    é uma indexação direta, sem varrer o DataFrame. A Região não é um eixo
+    próprio: cada estado pertence a uma única região, e a agregação por região é
+    um produto pela matriz de pertinência estado × região. Com dados anuais, o
+    eixo dos meses tem um único elemento.
+    """
+    
+    def __init__(self, df, columns=None):
+        if columns is None:
+            columns = [col for col in df.columns if col not in KEY_COLUMNS and pd.api.types.is_numeric_dtype(df[col])]
+        self.columns = list(columns)
+        self.monthly = 'Mês' in df.columns
+        
+        # Eixos: anos e estados na ordem em que aparecem nos dados, meses de 1 a 12
+        codigos_anos, anos = pd.factorize(df['Ano'])
+        codigos_estados, estados = pd.factorize(df['UF'])
+        self.years = np.asarray(anos).tolist()
+        self.states = [str(estado) for estado in estados]
+        self.months = list(range(1, 13)) if self.monthly else [None]
+        codigos_meses = df['Mês'].to_numpy(dtype='int64') - 1 if self.monthly else np.zeros(len(df), dtype='int64')
+        
+        self.year_index = {ano: i for i, ano in enumerate(self.years)}
+        self.state_index = {estado: i for i, estado in enumerate(self.states)}
+        self.column_index = {col: i for i, col in enumerate(self.columns)}
+        
+        # Regiões presentes nos dados e a matriz de pertinência estado × região
+        regioes = [STATE_REGION.get(estado, OTHER_REGION) for estado in self.states]
+        self.regions = [regiao for regiao in [*REGIONS, OTHER_REGION] if regiao in regioes]
+        self.region_index = {regiao: i for i, regiao in enumerate(self.regions)}
+        self.membership = np.zeros((len(self.states), len(self.regions)))
+        self.membership[np.arange(len(self.states)), [self.region_index[regiao] for regiao in regioes]] = 1.0
+        
+        # Soma as linhas em suas células (linhas repetidas para a mesma célula são acumuladas)
+        forma = (len(self.years), len(self.months), len(self.states))
+        celulas = np.ravel_multi_index((codigos_anos, codigos_meses, codigos_estados), forma)
+        self.values = np.zeros(forma + (len(self.columns),))
+        np.add.at(self.values.reshape(-1, len(self.columns)), celulas,
+                  df[self.columns].fillna(0.0).to_numpy(dtype='float64'))
+        
+        # Células com dados: distingue um estado ausente de um estado com arrecadação zero
+        self.present = np.zeros(forma, dtype=bool)
+        self.present.reshape(-1)[celulas] = True
+    
+    def column_indices(self, columns):
+        """Posições de uma coluna ou grupo de colunas no último eixo."""
+        if isinstance(columns, str):
+            return [self.column_index[columns]]
+        return [self.column_index[col] for col in columns]
+    
+    def _block(self, ano, months):
+        """Fatias dos anos e dos meses pedidos (todos, quando None), que indexam o cubo sem copiá-lo."""
+        anos = slice(None) if ano is None else slice(self.year_index[ano], self.year_index[ano] + 1)
+        if months is None:
+            return anos, slice(None)
+        if not self.monthly:
+            raise ValueError("O cubo não tem granularidade mensal (coluna 'Mês')")
+        meses = sorted(mes - 1 for mes in months)
+        # Meses consecutivos (um mês, um trimestre) viram uma fatia; os demais, uma lista de posições
+        if meses == list(range(meses[0], meses[-1] + 1)):
+            return anos, slice(meses[0], meses[-1] + 1)
+        return anos, meses
+    
+    def totals(self, columns, ano=None, months=None, level='UF'):
+        """Soma a coluna (ou grupo de colunas) no ano e meses pedidos, por estado ou por região.
+        
+        Retorna uma Series indexada pelos estados (ou regiões) com dados nesse
+        recorte, na ordem dos eixos do cubo; ano=None soma todo o histórico.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Nível desconhecido: {level!r} (use um de {LEVELS})")
+        anos, meses = self._block(ano, months)
+        
+        # O recorte de anos e meses é uma vista; só as colunas pedidas são copiadas antes da soma
+        valores = self.values[anos, meses].take(self.column_indices(columns), axis=-1).sum(axis=(0, 1, 3))
+        presentes = self.present[anos, meses].any(axis=(0, 1))
+        
+        if level == 'UF':
+            return pd.Series(valores[presentes], index=[e for e, p in zip(self.states, presentes) if p], dtype='float64')
+        
+        valores = valores @ self.membership
+        presentes = presentes @ self.membership > 0
+        return pd.Series(valores[presentes], index=[r for r, p in zip(self.regions, presentes) if p], dtype='float64')
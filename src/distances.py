@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import networkx as nx
+
+from writer import atomic_write
+
+def nodes_path(path):
+    """Caminho do arquivo com a lista de nós que acompanha a matriz salva em path."""
+    return os.path.splitext(path)[0] + '.nodes.json'
+
+class DistanceMatrix:
+    """Distâncias entre todos os pares de nós em uma matriz NumPy, com o mapeamento nó -> índice.
+    
+    Sem pesos, as distâncias (número de arestas) ficam em int16 e pares sem
+    caminho valem -1; com pesos, ficam em float32 e pares sem caminho valem inf.
+    """
+    
+    def __init__(self, nodes, matrix):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.matrix = matrix
+    
+    @classmethod
+    def compute(cls, G, weight=None, path=None):
+        """Calcula as distâncias com uma busca (BFS ou Dijkstra) por fonte, preenchendo uma linha por vez.
+        
+        Com path, a matriz é gravada diretamente em um .npy mapeado em memória,
+        sem precisar caber inteira na RAM. A gravação é feita em um arquivo
+        temporário, que só substitui o final quando está completo: quem lê a
+        matriz (ex.: a API durante uma nova execução) nunca a vê pela metade.
+        """
+        nodes = list(G)
+        index = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+        
+        if weight is None:
+            dtype, vazio = np.int16, -1
+            busca = nx.single_source_shortest_path_length
+        else:
+            dtype, vazio = np.float32, np.inf
+            busca = lambda G, source: nx.single_source_dijkstra_path_length(G, source, weight=weight)
+        
+        def preencher(matrix):
+            matrix[:] = vazio
+            for i, source in enumerate(nodes):
+                distancias = busca(G, source)
+                colunas = np.fromiter((index[node] for node in distancias), dtype=np.int64, count=len(distancias))
+                matrix[i, colunas] = np.fromiter(distancias.values(), dtype=np.float64, count=len(distancias))
+            return matrix
+        
+        if path is None:
+            return cls(nodes, preencher(np.empty((n, n), dtype=dtype)))
+        
+        def gravar(temporario):
+            matrix = preencher(np.lib.format.open_memmap(temporario, mode='w+', dtype=dtype, shape=(n, n)))
+            matrix.flush()
+            # Fecha o mapeamento antes da troca de nome (no Windows, um arquivo mapeado não pode ser substituído)
+            del matrix
+        
+        atomic_write(path, gravar)
+        resultado = cls(nodes, np.load(path, mmap_mode='r'))
+        resultado._save_nodes(path)
+        return resultado
+    
+    def _save_nodes(self, path):
+        """Salva a lista de nós ao lado da matriz (também por meio de um arquivo temporário)."""
+        def gravar(temporario):
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.nodes, f, ensure_ascii=False)
+        atomic_write(nodes_path(path), gravar)
+    
+    def save(self, path):
+        """Salva a matriz em .npy e a lista de nós em .nodes.json; retorna o caminho da matriz."""
+        def gravar(temporario):
+            # Com um arquivo aberto, o np.save não acrescenta a extensão .npy ao nome temporário
+            with open(temporario, 'wb') as f:
+                np.save(f, self.matrix)
+        atomic_write(path, gravar)
+        self._save_nodes(path)
+        return path
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Carrega uma matriz salva, por padrão mapeada em memória (somente leitura)."""
+        with open(nodes_path(path), encoding='utf-8') as f:
+            nodes = json.load(f)
+        return cls(nodes, np.load(path, mmap_mode='r' if mmap else None))
+    
+    def distance(self, u, v):
+        """Distância entre dois nós."""
+        return self.matrix[self.index[u], self.index[v]].item()
+    
+    def row(self, u):
+        """Distâncias de um nó a todos os outros, como dicionário nó -> distância."""
+        return dict(zip(self.nodes, self.matrix[self.index[u]].tolist()))
+    
+    def nearest(self, u, k):
+        """Os k nós mais próximos de u (excluindo ele mesmo e os inalcançáveis), do mais próximo ao mais distante."""
+        original = self.matrix[self.index[u]]
+        linha = np.asarray(original, dtype=np.float64)
+        
+        # Ignora o próprio nó e os pares sem caminho
+        linha[self.index[u]] = np.inf
+        linha[linha < 0] = np.inf
+        alcancaveis = int(np.isfinite(linha).sum())
+        k = min(k, alcancaveis)
+        if k == 0:
+            return []
+        
+        candidatos = np.argpartition(linha, k - 1)[:k]
+        candidatos = candidatos[np.argsort(linha[candidatos], kind='stable')]
+        return [(self.nodes[i], original[i].item()) for i in candidatos]
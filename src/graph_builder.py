@@ -0,0 +1,153 @@
+from collections import OrderedDict
+
+import networkx as nx
+
+from cube import KEY_COLUMNS, RevenueCube
+from instrumentation import stage
+
+# Resoluções temporais aceitas pelos grafos
+RESOLUTIONS = ('month', 'quarter', 'year')
+
+def value_columns(df):
+    """Retorna as colunas de arrecadação do DataFrame."""
+    return [col for col in df.columns if col not in KEY_COLUMNS]
+
+def edge_weights(df, columns):
+    """Calcula o peso de cada linha para uma coluna ou grupo de colunas, de forma vetorizada."""
+    if isinstance(columns, str):
+        return df[columns].astype('float64')
+    return df[list(columns)].sum(axis=1)
+
+def period_labels(df, resolution):
+    """Retorna o rótulo do período de cada linha na resolução pedida ('year', 'quarter' ou 'month')."""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolução desconhecida: {resolution!r} (use uma de {RESOLUTIONS})")
+    if resolution == 'year':
+        return df['Ano']
+    if 'Mês' not in df.columns:
+        raise ValueError(f"A resolução {resolution!r} exige dados mensais (coluna 'Mês')")
+    
+    if resolution == 'quarter':
+        return df['Ano'].astype(str) + '-T' + ((df['Mês'] - 1) // 3 + 1).astype(str)
+    return df['Ano'].astype(str) + '-' + df['Mês'].astype(str).str.zfill(2)
+
+def period_months(periodo, resolution):
+    """Inverso de period_labels: retorna (ano, meses) de um rótulo de período (meses=None para o ano inteiro)."""
+    if resolution == 'year':
+        return periodo, None
+    ano, parte = str(periodo).split('-')
+    if resolution == 'quarter':
+        trimestre = int(parte.lstrip('T'))
+        return int(ano), list(range(3 * trimestre - 2, 3 * trimestre + 1))
+    return int(ano), [int(parte)]
+
+def aggregate_by_period(df, resolution):
+    """Agrega o cubo mensal (Ano, Mês, UF) na resolução pedida, identificando cada período na coluna 'Periodo'."""
+    periodos = period_labels(df, resolution).rename('Periodo')
+    agregado = df[value_columns(df)].groupby([periodos, df['UF']], observed=True, sort=False).sum()
+    return agregado.reset_index()
+
+def build_bipartite_graph(df, columns, node_columns=None, period='Ano'):
+    """Cria o grafo bipartido estado-período com pesos dados pela coluna (ou soma de colunas) escolhida.
+    
+    Linhas repetidas para o mesmo par (UF, período), como nos dados mensais, são
+    somadas em uma única redução antes de carregar as arestas no grafo.
+    """
+    pesos = edge_weights(df, columns)
+    pesos = pesos.groupby([df['UF'], df[period]], observed=True, sort=False).sum()
+    
+    estados = pesos.index.get_level_values(0).astype(str).tolist()
+    anos = pesos.index.get_level_values(1).tolist()
+    
+    G = nx.Graph()
+    G.add_nodes_from(estados, bipartite=0)
+    G.add_nodes_from(anos, bipartite=1)
+    G.add_weighted_edges_from(zip(estados, anos, pesos.tolist()))
+    
+    # Atributos opcionais dos estados (nome do atributo -> coluna ou grupo de colunas)
+    if node_columns:
+        for atributo, colunas in node_columns.items():
+            valores = edge_weights(df, colunas).groupby(df['UF'], observed=True, sort=False).sum()
+            nx.set_node_attributes(G, dict(zip(valores.index.astype(str), valores.tolist())), atributo)
+    
+    return G
+
+def cube_graph(cube, periodo, columns, node_columns=None, resolution='year', level='UF'):
+    """Cria o grafo bipartido de um período diretamente do cubo, com estados (ou regiões) ligados ao período.
+    
+    O peso de cada aresta é a soma da coluna (ou grupo de colunas) no período,
+    lida do cubo sem filtrar o DataFrame; com level='Região', os estados são
+    agregados por região.
+    """
+    ano, meses = period_months(periodo, resolution)
+    pesos = cube.totals(columns, ano, meses, level)
+    
+    G = nx.Graph()
+    G.add_nodes_from(pesos.index, bipartite=0)
+    G.add_node(periodo, bipartite=1)
+    G.add_weighted_edges_from((no, periodo, peso) for no, peso in zip(pesos.index, pesos.tolist()))
+    
+    # Atributos opcionais dos nós (nome do atributo -> coluna ou grupo de colunas)
+    if node_columns:
+        for atributo, colunas in node_columns.items():
+            valores = cube.totals(colunas, ano, meses, level)
+            nx.set_node_attributes(G, dict(zip(valores.index, valores.tolist())), atributo)
+    
+    return G
+
+class GraphCache:
+    """Cache LRU dos grafos estado-período, indexado por (período, coluna ou grupo de colunas).
+    
+    Os dados são agregados na resolução pedida e separados por período uma única
+    vez; cada grafo é construído na primeira vez em que é pedido e reaproveitado
+    pelas etapas seguintes. Com dados anuais, cada período é um ano.
+    
+    Os grafos são construídos a partir do cubo pré-agregado (cube), que também
+    responde às consultas de totais por estado ou região sem varrer os dados.
+    """
+    
+    def __init__(self, df, maxsize=128, resolution='year'):
+        self.maxsize = maxsize
+        self.resolution = resolution
+        
+        # Dados anuais já estão na resolução pedida; dados mensais são agregados a partir do cubo
+        if resolution == 'year' and 'Mês' not in df.columns:
+            self.frame, self.period = df, 'Ano'
+        else:
+            self.frame, self.period = aggregate_by_period(df, resolution), 'Periodo'
+        
+        self._frames = {ano: df_ano for ano, df_ano in self.frame.groupby(self.period, sort=False)}
+        self.cube = RevenueCube(df, value_columns(df))
+        self._graphs = OrderedDict()
+    
+    def years(self):
+        """Retorna os períodos disponíveis (anos, trimestres ou meses), na ordem em que aparecem nos dados."""
+        return list(self._frames)
+    
+    def year_frame(self, ano):
+        """Retorna as linhas de um período."""
+        return self._frames[ano]
+    
+    def totals(self, ano, columns, level='UF'):
+        """Arrecadação do período por estado (ou região), lida do cubo."""
+        return self.cube.totals(columns, *period_months(ano, self.resolution), level=level)
+    
+    def get(self, ano, columns, node_columns=None, level='UF'):
+        """Retorna o grafo do período para a coluna escolhida (por estado ou região), construindo-o se necessário."""
+        chave = (ano, columns if isinstance(columns, str) else tuple(columns),
+                 tuple(node_columns) if node_columns else None, level)
+        
+        if chave in self._graphs:
+            self._graphs.move_to_end(chave)
+            return self._graphs[chave]
+        
+        with stage('graph_build', period=ano, rows=len(self._frames[ano])) as registro:
+            G = cube_graph(self.cube, ano, columns, node_columns, self.resolution, level)
+            registro.update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+        self._graphs[chave] = G
+        
+        # Descarta o grafo usado há mais tempo quando o cache está cheio
+        if len(self._graphs) > self.maxsize:
+            self._graphs.popitem(last=False)
+        
+        return G
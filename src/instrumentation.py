@@ -0,0 +1,164 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Instrumentação ativa no processo (None = desativada, e as etapas não custam nada)
+_active = None
+
+def describe(value):
+    """Contadores que descrevem a entrada de uma etapa: nós e arestas de um grafo, linhas de um DataFrame."""
+    if hasattr(value, 'number_of_edges'):
+        return {'nodes': value.number_of_nodes(), 'edges': value.number_of_edges()}
+    if hasattr(value, 'columns') and hasattr(value, '__len__'):
+        return {'rows': len(value)}
+    return {}
+
+def measured_call(function, trace_memory, *args):
+    """Executa a função medindo tempo e pico de memória; retorna (resultado, segundos, pico em MB).
+    
+    Usada nos processos de run_years, que não escrevem no log: as medidas
+    voltam com o resultado e são registradas pelo processo principal.
+    """
+    iniciou = trace_memory and not tracemalloc.is_tracing()
+    if iniciou:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    
+    inicio = time.perf_counter()
+    try:
+        resultado = function(*args)
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace_memory else None
+    finally:
+        if iniciou:
+            tracemalloc.stop()
+    
+    return resultado, segundos, pico
+
+class Instrumentation:
+    """Mede etapas aninhadas (tempo, pico de memória e contadores) e registra cada uma como uma linha JSON.
+    
+    Cada registro traz o caminho da etapa ('centrality/centrality_year'), os
+    segundos, o pico de memória em MB (com trace_memory) e os contadores
+    informados (linhas, nós, arestas, período...). Com profile_stage, a etapa
+    com esse nome (ou caminho) é executada sob o cProfile e as estatísticas
+    são salvas em profile_folder.
+    """
+    
+    def __init__(self, log_path='-', trace_memory=True, profile_stage=None, profile_folder='.'):
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_folder = profile_folder
+        self._stack = []
+        self._owns_tracing = False
+        self._pid = os.getpid()
+        
+        if log_path == '-':
+            self._log = sys.stdout
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            self._log = open(log_path, 'a', encoding='utf-8')
+    
+    def emit(self, record):
+        """Escreve um registro no log, como uma linha JSON."""
+        self._log.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._log.flush()
+    
+    def path(self, name):
+        """Caminho da etapa a partir das etapas em andamento."""
+        return '/'.join([frame['stage'] for frame in self._stack] + [name])
+    
+    @contextmanager
+    def stage(self, name, **counters):
+        """Mede o bloco como a etapa name; o dicionário devolvido recebe contadores adicionais."""
+        record = {'stage': self.path(name), **counters}
+        
+        # Processos filhos herdam a instrumentação, mas só o processo principal escreve no log
+        if os.getpid() != self._pid:
+            yield record
+            return
+        
+        if self.trace_memory:
+            # O tracemalloc só fica ligado enquanto há etapas em andamento (se não foi ligado por outro código)
+            if not self._stack:
+                self._owns_tracing = not tracemalloc.is_tracing()
+                if self._owns_tracing:
+                    tracemalloc.start()
+            # O pico da etapa externa até aqui é guardado antes de zerar o pico para esta
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        
+        perfil = None
+        if self.profile_stage in (name, record['stage']):
+            perfil = cProfile.Profile()
+            perfil.enable()
+        
+        self._stack.append({'stage': name, 'peak': 0})
+        inicio = time.perf_counter()
+        try:
+            yield record
+        except BaseException as erro:
+            record['error'] = type(erro).__name__
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - inicio, 6)
+            frame = self._stack.pop()
+            
+            if perfil is not None:
+                perfil.disable()
+                os.makedirs(self.profile_folder, exist_ok=True)
+                record['profile'] = os.path.join(self.profile_folder, record['stage'].replace('/', '.') + '.prof')
+                perfil.dump_stats(record['profile'])
+            
+            if self.trace_memory:
+                pico = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = round(pico / 2 ** 20, 3)
+                # O pico desta etapa também conta para a etapa externa
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], pico)
+                tracemalloc.reset_peak()
+                if not self._stack and self._owns_tracing:
+                    tracemalloc.stop()
+            
+            self.emit(record)
+    
+    def task(self, function, label, args, seconds, peak_mb):
+        """Registra uma tarefa executada em outro processo por run_years."""
+        record = {'stage': self.path(function.__name__), 'period': label, **describe(args[0] if args else None),
+                  'seconds': round(seconds, 6)}
+        if peak_mb is not None:
+            record['peak_mb'] = round(peak_mb, 3)
+        self.emit(record)
+    
+    def close(self):
+        """Fecha o arquivo de log (a saída padrão não é fechada)."""
+        if self._log is not sys.stdout:
+            self._log.close()
+
+def activate(instrumentation):
+    """Ativa a instrumentação no processo atual (None desativa)."""
+    global _active
+    _active = instrumentation
+
+def active():
+    """Retorna a instrumentação ativa, ou None."""
+    return _active
+
+@contextmanager
+def stage(name, **counters):
+    """Mede o bloco como uma etapa, se houver instrumentação ativa; caso contrário, não faz nada.
+    
+    O dicionário devolvido pode receber contadores conhecidos só dentro do bloco
+    (ex.: record['rows'] = len(df)).
+    """
+    if _active is None:
+        yield dict(counters)
+    else:
+        with _active.stage(name, **counters) as record:
+            yield record
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import networkx as nx
+
+# Semente fixa dos layouts aleatórios (spring), para que as posições não mudem entre execuções
+LAYOUT_SEED = 0
+
+# Subpasta, dentro da pasta de saída de cada etapa, onde as posições calculadas são guardadas
+LAYOUT_FOLDER = 'layouts'
+
+# Nó que substitui o nó do período (ancora) no cálculo e no armazenamento das posições
+ANCHOR = '<periodo>'
+
+# Algoritmos de layout com cache
+KINDS = ('spring', 'spiral', 'bipartite')
+
+# Posições já calculadas no processo atual: chave -> {nó: (x, y)}
+_layouts = {}
+
+def star_layout(center, nodes):
+    """Posiciona center em (0, 0) e os nós em (1, i), na ordem recebida, em uma única operação vetorizada."""
+    posicoes = np.column_stack((np.ones(len(nodes)), np.arange(len(nodes), dtype='float64')))
+    return {center: np.zeros(2), **dict(zip(nodes, posicoes))}
+
+def radial_layout(center, nodes):
+    """Posiciona center em (0, 0) e os nós em um círculo de raio 1, na ordem recebida (vetorizado)."""
+    angulos = np.pi / 2 - 2 * np.pi * np.arange(len(nodes)) / max(len(nodes), 1)
+    posicoes = np.column_stack((np.cos(angulos), np.sin(angulos)))
+    return {center: np.zeros(2), **dict(zip(nodes, posicoes))}
+
+def node_set_key(kind, nodes, seed=LAYOUT_SEED):
+    """Hash do conjunto de nós (sem importar a ordem) e do algoritmo, que identifica as posições no cache."""
+    conteudo = json.dumps([kind, seed, sorted(str(node) for node in nodes)], ensure_ascii=False)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:16]
+
+def compute_layout(G, kind, seed=LAYOUT_SEED):
+    """Calcula as posições de G; os nós são ordenados antes, para que o resultado não dependa da ordem de inserção."""
+    if kind not in KINDS:
+        raise ValueError(f"Layout desconhecido: {kind!r} (use um de {KINDS})")
+    
+    H = nx.Graph()
+    H.add_nodes_from(sorted(G, key=lambda node: (node == ANCHOR, str(node))))
+    H.add_edges_from(G.edges())
+    
+    if kind == 'spring':
+        # Sem pesos: a posição depende só da estrutura, e não dos valores de um ano
+        return nx.spring_layout(H, weight=None, seed=seed)
+    if kind == 'spiral':
+        return nx.spiral_layout(H)
+    return nx.bipartite_layout(H, nodes=[ANCHOR] if ANCHOR in H else [], align='vertical')
+
+def _read(path):
+    """Lê as posições salvas ({nó: (x, y)}), ou None se o arquivo não existir."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return {node: np.array(xy) for node, xy in json.load(f)}
+
+def _write(path, positions):
+    """Salva as posições em JSON, por meio de um arquivo temporário (processos paralelos podem gravar o mesmo layout)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporario = f'{path}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump([[node, np.asarray(xy).tolist()] for node, xy in positions.items()], f, ensure_ascii=False)
+    os.replace(temporario, path)
+
+def cached_layout(G, kind, anchor=None, folder=None, seed=LAYOUT_SEED):
+    """Posições dos nós de G, calculadas uma única vez por conjunto de nós e reaproveitadas.
+    
+    O nó anchor (em geral, o período) é trocado por ANCHOR antes do cálculo:
+    grafos de anos diferentes com os mesmos estados compartilham as posições,
+    que ficam estáveis entre os anos. Com folder, as posições também são salvas
+    em disco (uma por conjunto de nós) e valem entre execuções.
+    """
+    nos = [ANCHOR if node == anchor else node for node in G]
+    chave = f'{kind}-{node_set_key(kind, nos, seed)}'
+    caminho = os.path.join(folder, LAYOUT_FOLDER, f'{chave}.json') if folder else None
+    
+    if chave not in _layouts:
+        posicoes = _read(caminho) if caminho else None
+        if posicoes is None:
+            H = nx.relabel_nodes(G, {anchor: ANCHOR}) if anchor is not None else G
+            posicoes = compute_layout(H, kind, seed)
+            if caminho:
+                _write(caminho, posicoes)
+        _layouts[chave] = posicoes
+    
+    posicoes = _layouts[chave]
+    return {node: posicoes[ANCHOR if node == anchor else node] for node in G}
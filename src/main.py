@@ -1,32 +1,353 @@
-from process_data import load_data, preprocess_data, save_processed_data
-from create_graphs import create_bipartite_graph, draw_graph
-from analyze_graphs import analyze_graph
+import argparse
+import hashlib
+import importlib
+import os
+import sys
 
-def main():
-    # Caminho para o arquivo de dados
-    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
-    processed_file = 'C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv'
-    output_image = 'C:/Users/Mateus/ProjetoReceita/images/bipartite_graph.png'
-    output_folder_subgraphs = 'C:/Users/Mateus/ProjetoReceita/images/subgraphs'
+import instrumentation
+import writer
+from process_data import load_processed_data, save_processed_data
+from manifest import Manifest, slice_hashes, slice_key
+from metrics_store import METRICS_FILE, MetricsStore
+from render import RenderOptions
+
+# Etapas por ano do pipeline: nome -> (módulo, função, subpasta de saída em images/)
+# Os módulos só são importados quando a etapa é executada, para que comandos curtos
+# não paguem pelas bibliotecas que não usam
+YEAR_STAGES = {
+    'centrality': ('centrality', 'calculate_centrality', 'centrality_analysis'),
+    'shortest_paths': ('shortest_paths', 'calculate_shortest_paths', 'shortest_paths_analysis'),
+    'connected_components': ('connected_components', 'find_connected_components', 'connected_components_analysis'),
+    'communities': ('community_detection', 'detect_communities', 'community_detection'),
+    'subgraphs': ('create_subgraphs', 'create_subgraphs', 'subgraphs'),
+    'similarity': ('similarity', 'calculate_similarity', 'similarity_analysis'),
+    'temporal': ('temporal', 'analyze_temporal', 'temporal_analysis'),
+    'anomalies': ('anomalies', 'find_anomalies', 'anomaly_detection'),
+    'tax_network': ('tax_network', 'analyze_tax_network', 'tax_network_analysis'),
+}
+STAGES = ['bipartite'] + list(YEAR_STAGES)
+
+# Etapas que detectam comunidades e, portanto, recebem as opções da detecção
+COMMUNITY_STAGES = ('communities', 'similarity', 'temporal', 'tax_network')
+
+# Etapas cujo resultado de cada período depende de outros períodos (partição do período anterior, janelas móveis,
+# medianas, mudanças de patamar): qualquer mudança nos dados reprocessa todos os períodos
+HISTORY_STAGES = ('temporal', 'anomalies', 'tax_network')
+
+def stage_function(stage):
+    """Importa o módulo da etapa e retorna a sua função."""
+    module, function, _ = YEAR_STAGES[stage]
+    return getattr(importlib.import_module(module), function)
+
+def run_pipeline(input_file, processed_file, images_folder, stages, workers=1, render_options=RenderOptions(),
+                 force=False, chunksize=None, resolution='year', betweenness_options=None,
+                 community_options=None):
+    """Carrega os dados uma única vez e executa as etapas escolhidas sobre os mesmos grafos.
+    
+    Apenas os anos cujos dados mudaram (ou cujos arquivos gerados sumiram ou
+    foram alterados) são reprocessados, a menos que force seja verdadeiro.
+    Com resolution 'quarter' ou 'month', as etapas por ano passam a ser por
+    trimestre ou por mês, a partir dos dados mensais.
+    """
+    # O networkx (via graph_builder e communities) só é carregado pelos comandos que montam grafos
+    from communities import CommunityOptions
+    from graph_builder import GraphCache
+    
+    if community_options is None:
+        community_options = CommunityOptions()
+    
+    # Carrega os dados processados (o cache colunar só é reconstruído se o arquivo bruto mudar)
+    df_processed = load_processed_data(input_file, chunksize=chunksize, keep_month=resolution != 'year')
+    with instrumentation.stage('save_processed', rows=len(df_processed)):
+        save_processed_data(df_processed, processed_file)
+    
+    # Os grafos de cada período são construídos uma vez e compartilhados entre as etapas
+    graphs = GraphCache(df_processed, resolution=resolution)
     
-    # Carrega e processa os dados
-    df = load_data(input_file)
-    df_processed = preprocess_data(df)
-    save_processed_data(df_processed, processed_file)
+    # Hash dos dados de cada período, combinado com as opções de renderização que afetam as saídas
+    manifest = Manifest(os.path.join(images_folder, 'manifest.json'))
+    metrics = MetricsStore(os.path.join(images_folder, METRICS_FILE))
+    hashes = slice_hashes(graphs.frame, by=graphs.period)
+    entradas = {ano: f'{digest}:{tuple(render_options)}' for ano, digest in hashes.items()}
     
-    # Cria o grafo bipartido
-    G = create_bipartite_graph(df_processed)
+    # As anomalias usam todo o histórico do cubo: são calculadas no máximo uma vez por execução, para o grafo
+    # bipartido e para a etapa 'anomalies'
+    anomalias = None
     
-    # Desenha e salva o grafo
-    draw_graph(G, output_image)
+    # O grafo bipartido usa todos os anos, então depende do conjunto completo de hashes
+    entrada_bipartido = {'todos': '|'.join(entradas.values())}
+    if 'bipartite' in stages and (force or manifest.stale_years('bipartite', entrada_bipartido)):
+        from analyze_graphs import analyze_graph
+        from anomalies import Anomalies, mark_anomalies
+        from create_graphs import create_bipartite_graph, draw_graph
+        
+        with instrumentation.stage('bipartite') as registro:
+            # Cria o grafo bipartido
+            with instrumentation.stage('graph_build'):
+                G = create_bipartite_graph(df_processed)
+            registro.update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+            
+            # Marca nos nós dos estados as anomalias e mudanças de patamar das suas séries
+            with instrumentation.stage('anomalies'):
+                anomalias = Anomalies(graphs.cube)
+                mark_anomalies(G, anomalias)
+            
+            # Desenha e salva o grafo (com --no-render, nenhuma imagem é gerada)
+            os.makedirs(images_folder, exist_ok=True)
+            with instrumentation.stage('render'):
+                output_image = draw_graph(G, images_folder, render_options)
+            
+            # Realiza análises no grafo
+            with instrumentation.stage('analyze'):
+                analyze_graph(G, **(betweenness_options or {}))
+        
+        # O manifesto guarda o hash dos arquivos, que precisam estar gravados
+        writer.flush()
+        manifest.record('bipartite', 'todos', entrada_bipartido['todos'], [output_image] if output_image else [])
+        manifest.save()
     
-    # Realiza análises no grafo
-    analyze_graph(G)
+    for stage, (_, _, folder) in YEAR_STAGES.items():
+        if stage not in stages:
+            continue
+        
+        # As opções da detecção de comunidades também fazem parte da entrada das etapas que a usam
+        extras, entradas_etapa = {}, entradas
+        if stage in COMMUNITY_STAGES:
+            extras = {'community_options': community_options}
+            entradas_etapa = {ano: f'{valor}:{tuple(community_options)}' for ano, valor in entradas.items()}
+        if stage == 'anomalies' and anomalias is not None:
+            # Reaproveita a análise do grafo bipartido; sem ela, a etapa a calcula (dentro da sua medição)
+            extras = {'anomalies': anomalias}
+        if stage in HISTORY_STAGES:
+            historico = hashlib.sha1(entrada_bipartido['todos'].encode('utf-8')).hexdigest()
+            entradas_etapa = {ano: f'{valor}:{historico}' for ano, valor in entradas_etapa.items()}
+        
+        # Apenas os anos desatualizados para esta etapa são reprocessados
+        pendentes = set(entradas_etapa) if force else set(manifest.stale_years(stage, entradas_etapa, metrics.counts(stage)))
+        years = [ano for ano in graphs.years() if slice_key(ano) in pendentes]
+        if not years:
+            print(f"Etapa '{stage}' já está atualizada.")
+            continue
+        
+        output_folder = os.path.join(images_folder, folder)
+        os.makedirs(output_folder, exist_ok=True)
+        
+        function = stage_function(stage)
+        with instrumentation.stage(stage, periods=len(years)):
+            artefatos = function(df_processed, output_folder, graphs=graphs, workers=workers,
+                                 render_options=render_options, years=years, metrics=metrics, **extras)
+        
+        writer.flush()
+        linhas = metrics.counts(stage)
+        for ano, paths in artefatos.items():
+            manifest.record(stage, slice_key(ano), entradas_etapa[slice_key(ano)], paths, linhas.get(slice_key(ano), 0))
+        manifest.save()
+        print(f"Etapa '{stage}' concluída para {len(years)} período(s)!")
     
+    # O CSV processado (e qualquer escrita ainda pendente) é gravado antes de terminar
+    writer.flush()
 
-    # Cria e salva os subgrafos
-    create_subgraphs(df_processed, output_folder_subgraphs)
+def add_data_arguments(parser):
+    """Argumentos dos arquivos de entrada e de dados processados, comuns aos comandos."""
+    parser.add_argument('--input', default='C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv',
+                        help="arquivo CSV bruto de arrecadação")
+    parser.add_argument('--processed', default='C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv',
+                        help="arquivo CSV onde os dados processados são salvos")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="lê o arquivo bruto em blocos deste número de linhas (arquivos maiores que a memória)")
+
+def add_run_arguments(parser):
+    """Argumentos do comando run (o pipeline completo)."""
+    from betweenness import MODES, WEIGHT_TRANSFORMS
+    from communities import METHODS as COMMUNITY_METHODS
+    from graph_builder import RESOLUTIONS
+    
+    add_data_arguments(parser)
+    parser.add_argument('--images', default='C:/Users/Mateus/ProjetoReceita/images',
+                        help="pasta de saída das imagens e relatórios")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="etapas a executar (padrão: todas)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processos para os anos (1 = serial, 0 = todos os núcleos)")
+    parser.add_argument('--no-render', dest='render', action='store_false',
+                        help="calcula apenas as métricas, sem gerar imagens")
+    parser.add_argument('--format', choices=['png', 'svg'], default='png',
+                        help="formato das imagens geradas")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="resolução das imagens geradas")
+    parser.add_argument('--force', action='store_true',
+                        help="reprocessa todos os anos, mesmo os que não mudaram")
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='year',
+                        help="resolução temporal dos grafos por período (padrão: ano)")
+    parser.add_argument('--betweenness', choices=MODES, default='exact',
+                        help="cálculo da intermediação no grafo bipartido: exato, amostrado ou paralelo")
+    parser.add_argument('--betweenness-k', type=int, default=None,
+                        help="número de fontes sorteadas no modo amostrado")
+    parser.add_argument('--weight-transform', choices=WEIGHT_TRANSFORMS, default='inverse',
+                        help="conversão da arrecadação em distância para a intermediação")
+    parser.add_argument('--community-method', choices=COMMUNITY_METHODS, default='louvain',
+                        help="algoritmo de detecção de comunidades")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="semente da detecção de comunidades, para resultados reprodutíveis")
+    parser.add_argument('--restarts', type=int, default=1,
+                        help="reinícios da detecção de comunidades por período (fica a partição de maior modularidade)")
+    parser.add_argument('--log-json', default=None,
+                        help="registra tempo, pico de memória e contadores de cada etapa neste arquivo, em JSON ('-' = saída padrão)")
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help="não mede o pico de memória (o tracemalloc deixa a execução mais lenta)")
+    parser.add_argument('--profile', default=None, metavar='ETAPA',
+                        help="executa a etapa indicada (nome ou caminho, ex.: 'centrality') sob o cProfile")
+    parser.add_argument('--profile-folder', default='.',
+                        help="pasta onde as estatísticas do cProfile são salvas")
+
+def add_preprocess_arguments(parser):
+    """Argumentos do comando preprocess."""
+    add_data_arguments(parser)
+    parser.add_argument('--monthly', action='store_true', help="mantém a granularidade mensal")
+
+def add_serve_arguments(parser):
+    """Argumentos do comando serve (a API local)."""
+    from communities import METHODS as COMMUNITY_METHODS
+    from graph_builder import RESOLUTIONS
+    
+    add_data_arguments(parser)
+    parser.add_argument('--images', default='C:/Users/Mateus/ProjetoReceita/images',
+                        help="pasta de saída do pipeline, de onde vem a tabela de métricas")
+    parser.add_argument('--host', default='127.0.0.1', help="endereço em que a API atende")
+    parser.add_argument('--port', type=int, default=8000, help="porta em que a API atende")
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='year',
+                        help="resolução temporal dos grafos consultados")
+    parser.add_argument('--community-method', choices=COMMUNITY_METHODS, default='louvain',
+                        help="algoritmo de detecção de comunidades")
+    parser.add_argument('--seed', type=int, default=0, help="semente da detecção de comunidades")
+    parser.add_argument('--restarts', type=int, default=1, help="reinícios da detecção de comunidades")
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help="número de resultados de métricas mantidos em memória (os menos usados são descartados)")
+
+def add_animate_arguments(parser):
+    """Argumentos do comando animate."""
+    from graph_builder import RESOLUTIONS
+    
+    add_data_arguments(parser)
+    parser.add_argument('--output', default='C:/Users/Mateus/ProjetoReceita/images/animacao.gif',
+                        help="arquivo de saída (.gif ou .mp4, que exige o FFmpeg)")
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='year',
+                        help="um quadro por ano, trimestre ou mês")
+    parser.add_argument('--tax', nargs='+', default=['IMPOSTO SOBRE IMPORTAÇÃO'],
+                        help="coluna (ou colunas, somadas) de arrecadação animada")
+    parser.add_argument('--fps', type=int, default=4, help="quadros por segundo")
+    parser.add_argument('--dpi', type=int, default=100, help="resolução dos quadros")
+
+def run_command(args):
+    """Executa o pipeline com as opções da linha de comando."""
+    from communities import CommunityOptions
+    
+    render_options = RenderOptions(args.render, args.format, args.dpi)
+    
+    # A instrumentação só é ativada quando pedida (sem ela, as etapas não têm custo extra)
+    instrumentacao = None
+    if args.log_json or args.profile:
+        instrumentacao = instrumentation.Instrumentation(args.log_json or '-', trace_memory=args.trace_memory,
+                                                         profile_stage=args.profile, profile_folder=args.profile_folder)
+        instrumentation.activate(instrumentacao)
+    
+    try:
+        run_pipeline(args.input, args.processed, args.images, args.stages,
+                     workers=args.workers, render_options=render_options, force=args.force,
+                     chunksize=args.chunksize, resolution=args.resolution,
+                     betweenness_options={'mode': args.betweenness, 'k': args.betweenness_k,
+                                          'transform': args.weight_transform, 'workers': args.workers},
+                     community_options=CommunityOptions(args.community_method, args.seed, args.restarts))
+    finally:
+        if instrumentacao is not None:
+            instrumentation.activate(None)
+            instrumentacao.close()
+    return 0
+
+def preprocess_command(args):
+    """Apenas carrega e pré-processa os dados (atualizando o cache colunar) e salva o CSV processado."""
+    df_processed = load_processed_data(args.input, chunksize=args.chunksize, keep_month=args.monthly)
+    save_processed_data(df_processed, args.processed)
+    writer.flush()
+    print(f"Dados processados ({len(df_processed)} linhas) salvos em {args.processed}")
+    return 0
+
+def serve_command(args):
+    """Carrega os dados uma única vez e atende às consultas da API local até o processo ser interrompido."""
+    import asyncio
+    from api import QueryService, serve
+    from communities import CommunityOptions
+    
+    df_processed = load_processed_data(args.input, chunksize=args.chunksize, keep_month=args.resolution != 'year')
+    service = QueryService(df_processed, images_folder=args.images, resolution=args.resolution,
+                           community_options=CommunityOptions(args.community_method, args.seed, args.restarts),
+                           maxsize=args.cache_size)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+def animate_command(args):
+    """Grava a animação do grafo estado-período ao longo de todos os períodos."""
+    from animation import animate_revenue
+    from graph_builder import GraphCache
+    
+    df_processed = load_processed_data(args.input, chunksize=args.chunksize, keep_month=args.resolution != 'year')
+    graphs = GraphCache(df_processed, resolution=args.resolution)
+    colunas = args.tax[0] if len(args.tax) == 1 else args.tax
+    output_path = animate_revenue(df_processed, args.output, graphs=graphs, columns=colunas, fps=args.fps, dpi=args.dpi)
+    print(f"Animação de {len(graphs.years())} período(s) salva em {output_path}")
+    return 0
+
+# Comandos do próprio main: nome -> (função que adiciona os argumentos, função que executa, descrição)
+COMMANDS = {
+    'run': (add_run_arguments, run_command, "executa o pipeline (padrão)"),
+    'preprocess': (add_preprocess_arguments, preprocess_command, "apenas atualiza os dados processados"),
+    'serve': (add_serve_arguments, serve_command, "atende a consultas JSON sobre os grafos e as métricas (API local)"),
+    'animate': (add_animate_arguments, animate_command, "grava uma animação (GIF ou MP4) do grafo ao longo dos períodos"),
+}
+
+# Comandos que repassam os argumentos ao main() de outro módulo: nome -> (módulo, descrição)
+DELEGATED_COMMANDS = {
+    'benchmark': ('benchmark', "mede o tempo e a memória de cada etapa sobre dados sintéticos"),
+    'synthetic': ('synthetic_data', "gera dados sintéticos no formato do arquivo bruto"),
+}
+
+def main(argv=None):
+    """Ponto de entrada único, com subcomandos; sem subcomando, executa o pipeline (run)."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    
+    parser = argparse.ArgumentParser(description="Análise em grafos da arrecadação da Receita Federal.")
+    comandos = parser.add_subparsers(dest='command', metavar='COMANDO')
+    
+    subparsers = {}
+    for nome, (_, handler, descricao) in COMMANDS.items():
+        subparsers[nome] = comandos.add_parser(nome, help=descricao)
+        subparsers[nome].set_defaults(handler=handler)
+    
+    for nome, (_, descricao) in DELEGATED_COMMANDS.items():
+        comandos.add_parser(nome, help=descricao, add_help=False)
+    
+    # Compatibilidade com as chamadas sem subcomando (python main.py --stages ...)
+    if not argv or (argv[0] not in comandos.choices and argv[0] not in ('-h', '--help')):
+        argv = ['run'] + argv
+    
+    # Os comandos delegados tratam os próprios argumentos (inclusive --help)
+    if argv[0] in DELEGATED_COMMANDS:
+        modulo = importlib.import_module(DELEGATED_COMMANDS[argv[0]][0])
+        return modulo.main(argv[1:])
+    
+    # Só o comando escolhido recebe os seus argumentos: as opções de cada um importam os módulos que as definem
+    # (e o networkx), que os demais comandos não precisam carregar
+    if argv[0] in COMMANDS:
+        COMMANDS[argv[0]][0](subparsers[argv[0]])
+    
+    args = parser.parse_args(argv)
+    return args.handler(args)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """Calcula o hash SHA-256 do arquivo, lendo-o em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(chunk_size), b''):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+def slice_key(value):
+    """Converte o valor que identifica uma fatia (ex.: o ano 2000.0) em chave de texto ('2000')."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def slice_hashes(df, by='Ano'):
+    """Calcula o hash do conteúdo de cada fatia do DataFrame (por padrão, de cada ano)."""
+    # Um único hash vetorizado por linha; cada fatia combina os hashes das suas linhas
+    linhas = pd.util.hash_pandas_object(df, index=False)
+    
+    hashes = {}
+    for chave, grupo in linhas.groupby(df[by].to_numpy(), sort=False):
+        hashes[slice_key(chave)] = hashlib.sha256(grupo.to_numpy().tobytes()).hexdigest()
+    return hashes
+
+class Manifest:
+    """Registro em JSON dos hashes das entradas e dos artefatos gerados, usado no reprocessamento incremental."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.data = json.load(f)
+    
+    def changed(self, section, hashes):
+        """Retorna as chaves cujo hash difere do registrado na seção (ou que ainda não foram registradas)."""
+        anteriores = self.data.get(section, {})
+        return [chave for chave, valor in hashes.items() if anteriores.get(chave) != valor]
+    
+    def update(self, section, hashes):
+        """Substitui os hashes registrados na seção."""
+        self.data[section] = dict(hashes)
+    
+    def stale_years(self, stage, input_hashes, stored=None):
+        """Retorna os anos da etapa cuja entrada mudou ou cujos artefatos sumiram ou foram alterados.
+        
+        stored, se informado, é o número de linhas de métricas de cada ano na
+        tabela de métricas; anos cujas linhas sumiram também são retornados.
+        """
+        registros = self.data.get('stages', {}).get(stage, {})
+        stored = stored or {}
+        
+        anos = []
+        for ano, valor in input_hashes.items():
+            registro = registros.get(ano)
+            if (registro is None or registro['input'] != valor or
+                    registro.get('metrics', 0) != stored.get(ano, 0) or
+                    any(not os.path.exists(path) or file_hash(path) != digest
+                        for path, digest in registro['artifacts'].items())):
+                anos.append(ano)
+        return anos
+    
+    def record(self, stage, ano, input_hash, artifacts, metrics=0):
+        """Registra a entrada, os artefatos e o número de linhas de métricas gerados por uma etapa para um ano."""
+        self.data.setdefault('stages', {}).setdefault(stage, {})[ano] = {
+            'input': input_hash,
+            'artifacts': {path: file_hash(path) for path in artifacts},
+            'metrics': metrics,
+        }
+    
+    def save(self):
+        """Salva o manifesto, escrevendo em um arquivo temporário antes de substituir o anterior."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from manifest import slice_key
+
+# Nome padrão do arquivo da tabela de métricas, dentro da pasta de saída
+METRICS_FILE = 'metrics.sqlite'
+
+def metric_rows(metric, values):
+    """Converte um dicionário nó -> valor em linhas (métrica, nó, valor) da tabela de métricas."""
+    return [(metric, str(node), float(value)) for node, value in values.items()]
+
+class MetricsStore:
+    """Tabela única, em formato longo (etapa, ano, métrica, nó, valor), com as métricas de todas as etapas.
+
+    Fica em um arquivo SQLite, que pode ser consultado diretamente por outras
+    ferramentas. A escrita é feita apenas pelo processo principal, uma vez por
+    etapa, em uma única transação.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS metrics ('
+                'stage TEXT NOT NULL, year TEXT NOT NULL, metric TEXT NOT NULL, node TEXT NOT NULL, value REAL)'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS metrics_stage_year ON metrics (stage, year)')
+
+    def write(self, stage, rows_by_year):
+        """Substitui as métricas da etapa nos anos informados ({ano: [(métrica, nó, valor), ...]})."""
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM metrics WHERE stage = ? AND year = ?',
+                [(stage, slice_key(ano)) for ano in rows_by_year]
+            )
+            self.connection.executemany(
+                'INSERT INTO metrics (stage, year, metric, node, value) VALUES (?, ?, ?, ?, ?)',
+                ((stage, slice_key(ano), metric, node, value)
+                 for ano, rows in rows_by_year.items() for metric, node, value in rows)
+            )
+
+    def counts(self, stage):
+        """Número de linhas gravadas para cada ano da etapa."""
+        cursor = self.connection.execute('SELECT year, COUNT(*) FROM metrics WHERE stage = ? GROUP BY year', (stage,))
+        return dict(cursor.fetchall())
+
+    def read(self, stage=None, metric=None, years=None):
+        """Lê as métricas como DataFrame, filtrando opcionalmente por etapa, métrica e anos."""
+        filtros, parametros = [], []
+        if stage is not None:
+            filtros.append('stage = ?')
+            parametros.append(stage)
+        if metric is not None:
+            filtros.append('metric = ?')
+            parametros.append(metric)
+        if years is not None:
+            anos = [slice_key(ano) for ano in years]
+            filtros.append(f"year IN ({', '.join('?' * len(anos))})")
+            parametros.extend(anos)
+
+        consulta = 'SELECT stage, year, metric, node, value FROM metrics'
+        if filtros:
+            consulta += ' WHERE ' + ' AND '.join(filtros)
+        return pd.read_sql_query(consulta, self.connection, params=parametros)
+
+    def close(self):
+        """Fecha a conexão com o arquivo."""
+        self.connection.close()
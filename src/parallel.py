@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from instrumentation import active, describe, measured_call
+from writer import flush
+
+def resolve_workers(workers):
+    """Converte o número de processos pedido (0 ou None = todos os núcleos) em um inteiro."""
+    if not workers:
+        return os.cpu_count() or 1
+    return workers
+
+def flushed_call(function, *args):
+    """Executa a função e espera as escritas que ela agendou (usada nos processos de run_years).
+    
+    O processo principal registra os arquivos no manifesto logo que as tarefas
+    terminam, por isso cada processo grava tudo antes de devolver o resultado.
+    """
+    resultado = function(*args)
+    flush()
+    return resultado
+
+def run_years(function, tasks, workers=1, labels=None):
+    """Executa a função para cada tarefa (em geral, uma por ano) e devolve os resultados na ordem das tarefas.
+    
+    Com workers > 1 as tarefas são distribuídas em um ProcessPoolExecutor;
+    com workers == 1 (ou uma única tarefa) a execução é serial, no próprio processo.
+    Com a instrumentação ativa, cada tarefa é registrada como uma etapa,
+    identificada pelo rótulo correspondente em labels (por padrão, a posição).
+    """
+    workers = min(resolve_workers(workers), len(tasks))
+    instrumentacao = active()
+    if instrumentacao is not None:
+        return _run_measured(instrumentacao, function, tasks, workers, labels or list(range(len(tasks))))
+    
+    if workers <= 1:
+        return [function(*task) for task in tasks]
+    
+    # Os processos são criados por fork: as threads de escrita do processo principal terminam antes
+    flush()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(flushed_call, repeat(function), *zip(*tasks)))
+
+def _run_measured(instrumentacao, function, tasks, workers, labels):
+    """run_years com cada tarefa medida pela instrumentação ativa."""
+    if workers <= 1:
+        resultados = []
+        for label, task in zip(labels, tasks):
+            with instrumentacao.stage(function.__name__, period=label, **describe(task[0] if task else None)):
+                resultados.append(function(*task))
+        return resultados
+    
+    # Os processos medem as próprias tarefas; só o processo principal escreve no log
+    flush()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        medidas = list(executor.map(measured_call, repeat(flushed_call), repeat(instrumentacao.trace_memory),
+                                    repeat(function), *zip(*tasks)))
+    
+    for label, task, (_, segundos, pico) in zip(labels, tasks, medidas):
+        instrumentacao.task(function, label, task, segundos, pico)
+    return [resultado for resultado, _, _ in medidas]
@@ -1,37 +1,226 @@
+import os
+import re
+
 import pandas as pd
 
+from instrumentation import stage
+from manifest import Manifest, file_hash, slice_hashes, slice_key
+from writer import get_writer
+
+# Número de cada mês, como escrito na coluna 'Mês' do arquivo bruto
+MONTHS = {
+    'Janeiro': 1, 'Fevereiro': 2, 'Março': 3, 'Abril': 4, 'Maio': 5, 'Junho': 6,
+    'Julho': 7, 'Agosto': 8, 'Setembro': 9, 'Outubro': 10, 'Novembro': 11, 'Dezembro': 12,
+}
+
 def load_data(file_path):
     """Carrega os dados do arquivo CSV."""
     df = pd.read_csv(file_path, sep=';', encoding='latin1')
     return df
 
-def preprocess_data(df):
-    """Realiza o pré-processamento dos dados."""
-    # Remove colunas desnecessárias ou com valores nulos
-    df = df.dropna(axis=1, how='all')
+def drop_blank_rows(df):
+    """Descarta as linhas sem Ano e sem UF (como a linha ';;;...' vazia no final do arquivo bruto)."""
+    return df.dropna(subset=['Ano', 'UF'], how='all')
+
+def month_number(meses):
+    """Converte os nomes dos meses em números de 1 a 12.
+    
+    Um nome preenchido e desconhecido levanta ValueError com os valores não
+    reconhecidos: as linhas sem mês seriam descartadas pelo agrupamento e os
+    totais mensais ficariam errados sem nenhum aviso.
+    """
+    numeros = meses.str.strip().str.capitalize().map(MONTHS)
+    desconhecidos = numeros.isna() & meses.notna()
+    if desconhecidos.any():
+        valores = sorted(meses[desconhecidos].unique().tolist())
+        raise ValueError(f"{int(desconhecidos.sum())} linha(s) com mês desconhecido na coluna 'Mês': {valores}")
+    return numeros
+
+def preprocess_data(df, keep_month=False):
+    """Realiza o pré-processamento dos dados (por Ano e UF, ou por Ano, Mês e UF com keep_month)."""
+    # Remove linhas vazias e colunas desnecessárias ou com valores nulos
+    df = drop_blank_rows(df).dropna(axis=1, how='all')
     
     # Converte colunas de valores para numéricas
     for col in df.columns[3:]:
         df[col] = pd.to_numeric(df[col], errors='coerce')
     
-    # Agrupa por estado e ano, somando os valores
-    df_grouped = df.groupby(['Ano', 'UF']).sum().reset_index()
+    # Agrupa por estado e ano (e mês, como número), somando os valores;
+    # sem keep_month a coluna textual 'Mês' é descartada
+    chaves = ['Ano', 'UF']
+    if keep_month:
+        df['Mês'] = month_number(df['Mês'])
+        chaves = ['Ano', 'Mês', 'UF']
+    df_grouped = df.groupby(chaves).sum(numeric_only=True).reset_index()
     
-    return df_grouped
+    return convert_types(df_grouped)
+
+def preprocess_chunked(file_path, chunksize=100_000, keys=('Ano', 'UF'), max_partials=8):
+    """Lê o CSV bruto em blocos e acumula a soma por chave (ex.: Ano e UF), com memória limitada.
+    
+    Cada bloco é convertido para numérico e agrupado; os agregados parciais são
+    periodicamente somados entre si, de modo que a memória depende do número de
+    grupos e do tamanho do bloco, não do tamanho do arquivo.
+    """
+    # Dialeto e tipos explícitos: chaves e valores são lidos como texto e convertidos por bloco
+    colunas = pd.read_csv(file_path, sep=';', encoding='latin1', nrows=0).columns
+    colunas_valores = list(colunas[3:])
+    dtypes = {col: str for col in colunas}
+    dtypes['Ano'] = 'float64'
+    
+    niveis = list(range(len(keys)))
+    parciais = []
+    colunas_preenchidas = set()
+    
+    for bloco in pd.read_csv(file_path, sep=';', encoding='latin1', dtype=dtypes, chunksize=chunksize):
+        bloco = drop_blank_rows(bloco)
+        # Colunas inteiramente vazias no arquivo são descartadas, como em preprocess_data
+        colunas_preenchidas.update(bloco.columns[bloco.notna().any()])
+        
+        valores = bloco[colunas_valores].apply(pd.to_numeric, errors='coerce')
+        chaves = [month_number(bloco[chave]) if chave == 'Mês' else bloco[chave] for chave in keys]
+        parciais.append(valores.groupby(chaves).sum())
+        
+        # Soma os agregados parciais acumulados para manter a memória limitada
+        if len(parciais) >= max_partials:
+            parciais = [pd.concat(parciais).groupby(level=niveis).sum()]
+    
+    df_grouped = pd.concat(parciais).groupby(level=niveis).sum()
+    df_grouped = df_grouped[[col for col in colunas_valores if col in colunas_preenchidas]].reset_index()
+    
+    return convert_types(df_grouped)
+
+def preprocess_incremental(df, previous, changed_years, keep_month=False):
+    """Reagrupa apenas os anos alterados e reaproveita do resultado anterior os demais anos."""
+    anos_atuais = {slice_key(ano) for ano in df['Ano'].dropna().unique()}
+    anos_previos = previous['Ano'].map(slice_key)
+    
+    # Anos sem alteração (e que ainda existem no arquivo bruto) vêm do resultado anterior
+    partes = [previous[anos_previos.isin(anos_atuais) & ~anos_previos.isin(changed_years)]]
+    
+    alterados = df['Ano'].map(slice_key).isin(changed_years)
+    if alterados.any():
+        partes.append(preprocess_data(df[alterados], keep_month=keep_month))
+    
+    df_grouped = pd.concat(partes, ignore_index=True)
+    
+    # Colunas ausentes em uma das partes equivalem a somas vazias
+    chaves = ['Ano', 'Mês', 'UF'] if keep_month else ['Ano', 'UF']
+    colunas_valores = df_grouped.columns.drop(chaves)
+    df_grouped[colunas_valores] = df_grouped[colunas_valores].fillna(0)
+    df_grouped['UF'] = df_grouped['UF'].astype(str)
+    df_grouped = df_grouped.sort_values(chaves, ignore_index=True)
+    
+    return convert_types(df_grouped)
+
+def convert_types(df):
+    """Converte as colunas para tipos compactos: Ano e Mês inteiros, UF categórica e valores float64."""
+    df = df.copy()
+    df['Ano'] = df['Ano'].astype('int32')
+    if 'Mês' in df.columns:
+        df['Mês'] = df['Mês'].astype('int8')
+    df['UF'] = df['UF'].astype('category')
+    
+    colunas_valores = [col for col in df.columns if col not in ('Ano', 'Mês', 'UF')]
+    df[colunas_valores] = df[colunas_valores].astype('float64')
+    
+    return df
 
 def save_processed_data(df, output_path):
-    """Salva os dados processados em um novo arquivo CSV."""
-    df.to_csv(output_path, index=False)
+    """Salva os dados processados em um novo arquivo CSV, em segundo plano (a gravação é atômica)."""
+    return get_writer().submit(output_path, lambda temporario: df.to_csv(temporario, index=False))
+
+def save_cache(df, cache_path):
+    """Salva os dados processados no cache colunar (Feather sem compressão, para permitir mmap)."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    
+    # Escreve em um arquivo temporário e renomeia, para nunca deixar um cache pela metade
+    temp_path = cache_path + '.tmp'
+    df.to_feather(temp_path, compression='uncompressed')
+    os.replace(temp_path, cache_path)
+
+def read_cache(cache_path):
+    """Lê o cache colunar mapeando o arquivo em memória."""
+    from pyarrow import feather
+    
+    table = feather.read_table(cache_path, memory_map=True)
+    return table.to_pandas()
+
+def load_processed_data(input_file, cache_folder=None, chunksize=None, keep_month=False):
+    """Carrega os dados processados do cache, reconstruindo-o apenas se o arquivo bruto mudou.
+    
+    Com chunksize, o arquivo bruto é lido em blocos (preprocess_chunked), para
+    arquivos que não cabem na memória; nesse modo o reagrupamento é sempre completo.
+    Com keep_month, os dados mantêm a granularidade mensal (Ano, Mês, UF), em um cache próprio.
+    """
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(os.path.abspath(input_file)), 'cache')
+    
+    # O cache é identificado pelo hash do arquivo bruto
+    digest = file_hash(input_file)[:16]
+    nome_base = os.path.splitext(os.path.basename(input_file))[0]
+    if keep_month:
+        nome_base += '-mensal'
+    cache_path = os.path.join(cache_folder, f'{nome_base}-{digest}.feather')
+    
+    if os.path.exists(cache_path):
+        with stage('load', source='cache') as registro:
+            df = read_cache(cache_path)
+            registro['rows'] = len(df)
+        return df
+    
+    # O manifesto guarda o hash de cada ano do arquivo bruto e o nome do último cache
+    manifest = Manifest(os.path.join(cache_folder, f'{nome_base}-manifest.json'))
+    cache_anterior = manifest.data.get('cache')
+    
+    if chunksize:
+        # Leitura em blocos: sem o arquivo inteiro na memória não há hashes por ano
+        chaves = ('Ano', 'Mês', 'UF') if keep_month else ('Ano', 'UF')
+        with stage('preprocess', source='chunked') as registro:
+            df = preprocess_chunked(input_file, chunksize, keys=chaves)
+            registro['rows'] = len(df)
+        hashes = {}
+    elif cache_anterior and os.path.exists(os.path.join(cache_folder, cache_anterior)):
+        # Reagrupa apenas os anos cujas linhas mudaram desde o último cache
+        with stage('load', source='raw') as registro:
+            df_raw = load_data(input_file)
+            registro['rows'] = len(df_raw)
+        hashes = slice_hashes(df_raw)
+        previous = read_cache(os.path.join(cache_folder, cache_anterior))
+        with stage('preprocess', source='incremental') as registro:
+            df = preprocess_incremental(df_raw, previous, manifest.changed('raw', hashes), keep_month=keep_month)
+            registro['rows'] = len(df)
+    else:
+        with stage('load', source='raw') as registro:
+            df_raw = load_data(input_file)
+            registro['rows'] = len(df_raw)
+        hashes = slice_hashes(df_raw)
+        with stage('preprocess', source='full') as registro:
+            df = preprocess_data(df_raw, keep_month=keep_month)
+            registro['rows'] = len(df)
+    
+    # Remove caches antigos do mesmo arquivo (e da mesma granularidade) antes de gravar o novo
+    if os.path.isdir(cache_folder):
+        for nome in os.listdir(cache_folder):
+            if re.fullmatch(re.escape(nome_base) + r'-[0-9a-f]{16}\.feather', nome):
+                os.remove(os.path.join(cache_folder, nome))
+    
+    save_cache(df, cache_path)
+    
+    manifest.update('raw', hashes)
+    manifest.data['cache'] = os.path.basename(cache_path)
+    manifest.save()
+    
+    return df
 
 if __name__ == "__main__":
     # Caminho para o arquivo de dados
     input_file = '../data/arrecadacao-estado.csv'
     output_file = '../data/processed_arrecadacao.csv'
     
-    # Carrega e processa os dados
-    df = load_data(input_file)
-    df_processed = preprocess_data(df)
+    # Carrega e processa os dados (usando o cache colunar quando disponível)
+    df_processed = load_processed_data(input_file)
     
     # Salva os dados processados
     save_processed_data(df_processed, output_file)
-    print("Dados processados e salvos com sucesso!")
\ No newline at end of file
+    print("Dados processados e salvos com sucesso!")
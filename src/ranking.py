@@ -0,0 +1,11 @@
+def rank_totals(totais, ascending=False):
+    """Ordena os nós de uma Series de totais (ex.: GraphCache.totals) em uma única ordenação."""
+    return totais.sort_values(ascending=ascending, kind='stable').index.astype(str).tolist()
+
+def top_k(totais, k):
+    """Retorna os k nós com maior total, do maior para o menor."""
+    return totais.nlargest(k).index.astype(str).tolist()
+
+def bottom_k(totais, k):
+    """Retorna os k nós com menor total, do menor para o maior."""
+    return totais.nsmallest(k).index.astype(str).tolist()
@@ -0,0 +1,107 @@
+import io
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from writer import get_writer
+
+# Opções da etapa de renderização (enabled=False corresponde a --no-render)
+RenderOptions = namedtuple('RenderOptions', ['enabled', 'fmt', 'dpi'], defaults=[True, 'png', 300])
+
+# Renderizadores do processo atual, um por configuração, reaproveitados entre os anos
+_renderers = {}
+
+class Renderer:
+    """Desenha grafos em uma única figura Agg, que é limpa e reaproveitada a cada imagem."""
+    
+    def __init__(self, fmt='png', dpi=300, figsize=(12, 8)):
+        # O matplotlib só é carregado quando o primeiro renderizador é criado
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        
+        self.fmt = fmt
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+    
+    def start(self, title):
+        """Limpa os eixos para uma nova imagem e define o título."""
+        self.ax.clear()
+        self.ax.set_title(title, fontsize=16)
+        self.ax.axis('off')  # Remove os eixos
+        return self.ax
+    
+    def save(self, output_folder, name):
+        """Renderiza a figura atual em memória e agenda a gravação; retorna o caminho do arquivo.
+        
+        A figura é reaproveitada pela próxima imagem, por isso a renderização
+        acontece aqui; só a escrita em disco fica para o escritor em segundo plano.
+        """
+        output_path = os.path.join(output_folder, f'{name}.{self.fmt}')
+        conteudo = io.BytesIO()
+        self.figure.savefig(conteudo, format=self.fmt, bbox_inches='tight', dpi=self.dpi)
+        return get_writer().submit_bytes(output_path, conteudo.getvalue())
+
+def get_renderer(options):
+    """Retorna o renderizador do processo atual para as opções informadas."""
+    chave = (options.fmt, options.dpi)
+    if chave not in _renderers:
+        _renderers[chave] = Renderer(options.fmt, options.dpi)
+    return _renderers[chave]
+
+def draw_weighted_graph(G, pos, title, labeled_edges, output_folder, name, options,
+                        nodelist=None, node_color='skyblue', edge_label_color='red'):
+    """Desenha o grafo com os pesos das arestas indicadas e salva a imagem."""
+    # Como o matplotlib, o networkx só é carregado quando há imagens a desenhar
+    import networkx as nx
+    
+    renderer = get_renderer(options)
+    ax = renderer.start(title)
+    
+    # Desenha todos os nós em uma única coleção (node_color pode ser uma lista de cores)
+    nx.draw_networkx_nodes(
+        G, pos,
+        nodelist=nodelist,
+        node_size=1000,
+        node_color=node_color,
+        alpha=0.8,
+        ax=ax
+    )
+    
+    # Desenha as arestas
+    nx.draw_networkx_edges(
+        G, pos,
+        width=1.0,
+        edge_color='gray',
+        alpha=0.5,
+        ax=ax
+    )
+    
+    # Desenha os rótulos das arestas
+    edge_labels = {(u, v): f"{G.edges[u, v]['weight']:.2f}" for u, v in labeled_edges}
+    nx.draw_networkx_edge_labels(
+        G, pos,
+        edge_labels=edge_labels,
+        font_size=8,
+        font_color=edge_label_color,
+        bbox=dict(facecolor='white', edgecolor='none', alpha=0.7),  # Fundo branco para melhor legibilidade
+        ax=ax
+    )
+    
+    # Desenha os rótulos dos nós
+    nx.draw_networkx_labels(
+        G, pos,
+        font_size=10,
+        font_weight='bold',
+        font_color='black',
+        ax=ax
+    )
+    
+    return renderer.save(output_folder, name)
+
+def dominant_colors(G, nodes, attributes, colors):
+    """Escolhe para cada nó a cor do atributo de maior valor (o primeiro, em caso de empate)."""
+    valores = np.array([[G.nodes[node][atributo] for atributo in attributes] for node in nodes])
+    return [colors[i] for i in valores.argmax(axis=1)]
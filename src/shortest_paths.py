@@ -1,94 +1,84 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
 import os
 
-def calculate_shortest_paths(df, output_folder):
-    """Calcula os caminhos mais curtos entre todos os pares de nós e salva os resultados."""
-    anos = df['Ano'].unique()
+from distances import DistanceMatrix, nodes_path
+from graph_builder import GraphCache
+from layouts import star_layout
+from metrics_store import METRICS_FILE, MetricsStore, metric_rows
+from parallel import run_years
+from process_data import load_processed_data
+from ranking import rank_totals
+from render import RenderOptions, draw_weighted_graph
+
+def shortest_paths_year(G, ano, output_folder):
+    """Calcula as distâncias entre todos os pares de nós de um ano e salva a matriz em .npy.
+    
+    Retorna o caminho da matriz e as linhas (métrica, nó, valor) com a
+    excentricidade de cada nó (maior distância até um nó alcançável).
+    """
+    # A matriz é gravada diretamente no disco, uma linha (busca em largura) por nó de origem
+    output_path = os.path.join(output_folder, f'shortest_paths_{ano}.npy')
+    distancias = DistanceMatrix.compute(G, path=output_path)
+    
+    # Pares sem caminho valem -1 e não afetam o máximo de cada linha
+    excentricidade = dict(zip(distancias.nodes, distancias.matrix.max(axis=1).tolist()))
+    return output_path, metric_rows('eccentricity', excentricidade)
+
+def render_shortest_paths(G, ano, estados_ordenados, output_folder, render_options):
+    """Gera a visualização gráfica do grafo de caminhos mais curtos de um ano."""
+    # Ano no centro e estados à direita, ordenados
+    pos = star_layout(ano, estados_ordenados)
+    
+    return draw_weighted_graph(
+        G, pos, f"Caminhos Mais Curtos no Ano {ano}",
+        [(estado, ano) for estado in estados_ordenados],
+        output_folder, f'shortest_paths_graph_{ano}', render_options
+    )
+
+def calculate_shortest_paths(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                             metrics=None):
+    """Calcula as distâncias entre todos os pares de nós e salva as matrizes; retorna os arquivos gerados por ano."""
+    # Sem um cache compartilhado pelo pipeline, os grafos são construídos aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    # Anos a processar (por padrão, todos)
+    anos = graphs.years() if years is None else list(years)
+    
+    # Os grafos são obtidos no processo principal, pois o cache não é compartilhado entre processos
+    grafos = [graphs.get(ano, 'IMPOSTO SOBRE IMPORTAÇÃO') for ano in anos]
+    
+    # Calcula as métricas (em paralelo se workers > 1) e relata os resultados na ordem dos anos
+    tarefas = [(G, ano, output_folder) for G, ano in zip(grafos, anos)]
+    artefatos, linhas = {}, {}
+    for ano, (output_path, rows) in zip(anos, run_years(shortest_paths_year, tarefas, workers, labels=anos)):
+        artefatos[ano] = [output_path, nodes_path(output_path)]
+        linhas[ano] = rows
+        print(f"Caminhos mais curtos no ano {ano} salvos em {output_path}")
+    
+    # As excentricidades de todos os anos são gravadas de uma só vez na tabela de métricas
+    metrics.write('shortest_paths', linhas)
+    
+    # Etapa de renderização, separada do cálculo das métricas
+    if render_options.enabled:
+        tarefas = [
+            (G, ano, rank_totals(graphs.totals(ano, 'IMPOSTO SOBRE IMPORTAÇÃO')), output_folder, render_options)
+            for G, ano in zip(grafos, anos)
+        ]
+        for ano, image_path in zip(anos, run_years(render_shortest_paths, tarefas, workers, labels=anos)):
+            artefatos[ano].append(image_path)
+            print(f"Visualização dos caminhos mais curtos no ano {ano} salva em {image_path}")
     
-    for ano in anos:
-        df_ano = df[df['Ano'] == ano]
-        G = nx.Graph()
-        
-        # Adiciona nós e arestas ao grafo
-        for _, row in df_ano.iterrows():
-            estado = row['UF']
-            arrecadacao = row['IMPOSTO SOBRE IMPORTAÇÃO']
-            G.add_node(estado, bipartite=0)
-            G.add_node(ano, bipartite=1)
-            G.add_edge(estado, ano, weight=arrecadacao)
-        
-        # Ordena os estados por valor de imposto sobre importação (decrescente)
-        estados_ordenados = sorted(df_ano['UF'], key=lambda x: df_ano[df_ano['UF'] == x]['IMPOSTO SOBRE IMPORTAÇÃO'].values[0], reverse=True)
-        
-        # Define posições dos nós manualmente
-        pos = {}
-        pos[ano] = (0, 0)  # Ano no centro
-        for i, estado in enumerate(estados_ordenados):
-            pos[estado] = (1, i)  # Estados à direita, ordenados
-        
-        # Calcula os caminhos mais curtos
-        shortest_paths = dict(nx.all_pairs_shortest_path_length(G))
-        
-        # Salva os resultados em um arquivo de texto
-        output_path = os.path.join(output_folder, f'shortest_paths_{ano}.txt')
-        with open(output_path, 'w') as f:
-            f.write(f"Caminhos Mais Curtos no Ano {ano}:\n")
-            for source, paths in shortest_paths.items():
-                for target, length in paths.items():
-                    f.write(f"{source} -> {target}: {length}\n")
-        
-        # Gera uma visualização gráfica do grafo
-        plt.figure(figsize=(12, 8))
-        
-        # Desenha os nós
-        nx.draw_networkx_nodes(
-            G, pos,
-            node_size=1000,
-            node_color='skyblue',
-            alpha=0.8
-        )
-        
-        # Desenha as arestas
-        edges = nx.draw_networkx_edges(
-            G, pos,
-            width=1.0,
-            edge_color='gray',
-            alpha=0.5
-        )
-        
-        # Desenha os rótulos das arestas
-        edge_labels = {(estado, ano): f"{G.edges[estado, ano]['weight']:.2f}" for estado in estados_ordenados}
-        nx.draw_networkx_edge_labels(
-            G, pos,
-            edge_labels=edge_labels,
-            font_size=8,
-            font_color='red',
-            bbox=dict(facecolor='white', edgecolor='none', alpha=0.7)  # Fundo branco para melhor legibilidade
-        )
-        
-        # Desenha os rótulos dos nós
-        nx.draw_networkx_labels(
-            G, pos,
-            font_size=10,
-            font_weight='bold',
-            font_color='black'
-        )
-        
-        # Adiciona título e remove eixos
-        plt.title(f"Caminhos Mais Curtos no Ano {ano}", fontsize=16)
-        plt.axis('off')  # Remove os eixos
-        
-        # Salva a imagem
-        plt.savefig(os.path.join(output_folder, f'shortest_paths_graph_{ano}.png'), bbox_inches='tight', dpi=300)
-        plt.close()
-        
-        print(f"Caminhos mais curtos no ano {ano} salvos em {output_path} e visualização salva em {output_folder}/shortest_paths_graph_{ano}.png")
+    return artefatos
 
 if __name__ == "__main__":
-    # Caminho para o arquivo de dados processados
-    processed_file = 'C:/Users/Mateus/ProjetoReceita/data/processed_arrecadacao.csv'
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
     output_folder = 'C:/Users/Mateus/ProjetoReceita/images/shortest_paths_analysis'
     
     # Verifica se a pasta de saída existe, caso contrário, cria-a
@@ -96,7 +86,7 @@ if __name__ == "__main__":
         os.makedirs(output_folder)
     
     # Carrega os dados processados
-    df = pd.read_csv(processed_file)
+    df = load_processed_data(input_file)
     
     # Realiza a análise de caminhos mais curtos
     calculate_shortest_paths(df, output_folder)
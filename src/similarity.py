@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import networkx as nx
+
+from centrality import centrality_year
+from communities import CommunityOptions
+from community_detection import communities_year
+from connected_components import connected_components_year
+from graph_builder import GraphCache, value_columns
+from metrics_store import METRICS_FILE, MetricsStore
+from parallel import run_years
+from process_data import load_processed_data
+from render import RenderOptions
+
+# Medidas de similaridade entre perfis de arrecadação
+METHODS = ('cosine', 'correlation')
+
+def entity_tax_matrix(df, columns=None, entity='UF'):
+    """Monta a matriz entidade × tipo de imposto, somando as linhas de cada entidade."""
+    colunas = list(columns) if columns is not None else value_columns(df)
+    totais = df.groupby(entity, observed=True)[colunas].sum()
+    return totais.to_numpy(dtype='float64'), totais.index.astype(str).tolist(), colunas
+
+def normalize_rows(X, method='cosine'):
+    """Normaliza as linhas para que o produto escalar entre elas seja a similaridade pedida."""
+    if method not in METHODS:
+        raise ValueError(f"Medida desconhecida: {method!r} (use uma de {METHODS})")
+    
+    if method == 'correlation':
+        X = X - X.mean(axis=1, keepdims=True)
+    
+    # Linhas nulas (sem arrecadação ou constantes) ficam com similaridade zero
+    normas = np.linalg.norm(X, axis=1, keepdims=True)
+    return np.divide(X, normas, out=np.zeros_like(X), where=normas > 0)
+
+def similarity_matrix(X, method='cosine', k=5, threshold=None, block_size=1024):
+    """Calcula a matriz esparsa e simétrica de similaridade entre as linhas de X.
+    
+    A similaridade é calculada em blocos de linhas (block_size × n) e cada bloco
+    é esparsificado antes do seguinte: mantêm-se os k vizinhos mais similares de
+    cada linha e/ou as similaridades acima de threshold. A matriz densa n × n
+    nunca é montada.
+    """
+    if k is None and threshold is None:
+        raise ValueError("Informe k e/ou threshold para esparsificar a similaridade")
+    
+    # O SciPy só é carregado quando a etapa de similaridade é executada
+    from scipy import sparse
+    
+    Xn = normalize_rows(np.asarray(X, dtype='float64'), method)
+    n = Xn.shape[0]
+    linhas, colunas = [], []
+    
+    for inicio in range(0, n, block_size):
+        bloco = Xn[inicio:inicio + block_size] @ Xn.T
+        indices = np.arange(inicio, inicio + bloco.shape[0])
+        
+        # A similaridade de cada linha consigo mesma não é uma aresta
+        bloco[np.arange(bloco.shape[0]), indices] = -np.inf
+        
+        if k is not None and k < n - 1:
+            # Os k maiores valores de cada linha, sem ordenar a linha inteira
+            vizinhos = np.argpartition(bloco, -k, axis=1)[:, -k:]
+            mascara = np.zeros_like(bloco, dtype=bool)
+            np.put_along_axis(mascara, vizinhos, True, axis=1)
+        else:
+            mascara = np.isfinite(bloco)
+        
+        if threshold is not None:
+            mascara &= bloco >= threshold
+        
+        # Similaridade nula (ex.: entidade sem arrecadação) não gera aresta
+        mascara &= bloco != 0
+        
+        r, c = np.nonzero(mascara)
+        linhas.append(r + inicio)
+        colunas.append(c)
+    
+    # Simetriza: uma aresta existe se qualquer um dos dois nós incluir o outro entre os vizinhos. A união é feita
+    # sobre a máscara (o máximo dos valores descartaria similaridades negativas guardadas por um só dos lados)
+    M = sparse.csr_matrix(
+        (np.ones(sum(len(r) for r in linhas), dtype=bool), (np.concatenate(linhas), np.concatenate(colunas))),
+        shape=(n, n)
+    )
+    r, c = M.maximum(M.T).nonzero()
+    
+    # A similaridade de cada par da união, recalculada a partir das linhas normalizadas
+    return sparse.csr_matrix((np.einsum('ij,ij->i', Xn[r], Xn[c]), (r, c)), shape=(n, n))
+
+def similarity_graph(df, columns=None, entity='UF', method='cosine', k=5, threshold=None):
+    """Cria o grafo de similaridade entre entidades (estados ou municípios) pelos seus perfis de arrecadação."""
+    from scipy import sparse
+    
+    X, entidades, _ = entity_tax_matrix(df, columns, entity)
+    A = sparse.triu(similarity_matrix(X, method, k, threshold), k=1).tocoo()
+    
+    nomes = np.asarray(entidades, dtype=object)
+    G = nx.Graph()
+    G.add_nodes_from(entidades)
+    G.add_weighted_edges_from(zip(nomes[A.row], nomes[A.col], A.data.tolist()))
+    return G
+
+def similarity_year(df_ano, method, k, threshold, community_options):
+    """Cria o grafo de similaridade de um ano e executa sobre ele centralidade, componentes e comunidades.
+    
+    Retorna as linhas (métrica, nó, valor) das três análises.
+    """
+    G = similarity_graph(df_ano, method=method, k=k, threshold=threshold)
+    return centrality_year(G) + connected_components_year(G) + communities_year(G, community_options)
+
+def calculate_similarity(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                         metrics=None, method='cosine', k=5, threshold=None, community_options=CommunityOptions()):
+    """Analisa os grafos de similaridade entre estados de cada ano; retorna os arquivos gerados por ano (nenhum).
+    
+    Esta etapa só produz métricas: render_options é aceito para manter a
+    mesma assinatura das demais etapas do pipeline.
+    """
+    # Sem um cache compartilhado pelo pipeline, os dados são separados por ano aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    # Anos a processar (por padrão, todos)
+    anos = graphs.years() if years is None else list(years)
+    
+    # As métricas de todos os anos são gravadas de uma só vez na tabela de métricas
+    tarefas = [(graphs.year_frame(ano), method, k, threshold, community_options) for ano in anos]
+    linhas = run_years(similarity_year, tarefas, workers, labels=anos)
+    metrics.write('similarity', dict(zip(anos, linhas)))
+    print(f"Análise de similaridade de {len(anos)} ano(s) salva em {metrics.path}")
+    
+    return {ano: [] for ano in anos}
+
+if __name__ == "__main__":
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
+    output_folder = 'C:/Users/Mateus/ProjetoReceita/images/similarity_analysis'
+    
+    # Verifica se a pasta de saída existe, caso contrário, cria-a
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    # Carrega os dados processados
+    df = load_processed_data(input_file)
+    
+    # Realiza a análise de similaridade
+    calculate_similarity(df, output_folder)
+    print("Análise de similaridade concluída!")
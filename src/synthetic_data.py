@@ -0,0 +1,95 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from process_data import MONTHS
+
+# Siglas dos estados, usadas como as primeiras entidades dos dados sintéticos
+STATES = [
+    'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+    'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO',
+]
+
+# Primeiras colunas de arrecadação do arquivo real (as análises usam a de importação e as de IPI)
+TAX_COLUMNS = [
+    'IMPOSTO SOBRE IMPORTAÇÃO', 'IMPOSTO SOBRE EXPORTAÇÃO', 'IPI - FUMO', 'IPI - BEBIDAS',
+    'IPI - AUTOMÓVEIS', 'IPI - VINCULADO À IMPORTACAO', 'IPI - OUTROS', 'IRPF',
+    'IRPJ - ENTIDADES FINANCEIRAS', 'IRPJ - DEMAIS EMPRESAS', 'IRRF - RENDIMENTOS DO TRABALHO',
+    'IRRF - RENDIMENTOS DO CAPITAL', 'IRRF - REMESSAS P/ EXTERIOR', 'IRRF - OUTROS RENDIMENTOS',
+    'IMPOSTO S/ OPERAÇÕES FINANCEIRAS', 'IMPOSTO TERRITORIAL RURAL',
+]
+
+# Colunas mínimas para que todas as análises encontrem as colunas que usam
+MIN_TAXES = TAX_COLUMNS.index('IPI - OUTROS') + 1
+
+def entity_names(entities):
+    """Nomes das entidades: as siglas dos estados e, além delas, códigos como os de municípios."""
+    return STATES[:entities] + [f'M{i:05d}' for i in range(len(STATES), entities)]
+
+def tax_names(taxes):
+    """Nomes das colunas de arrecadação: as do arquivo real e, além delas, colunas numeradas."""
+    if taxes < MIN_TAXES:
+        raise ValueError(f"São necessárias pelo menos {MIN_TAXES} colunas de arrecadação (recebido: {taxes})")
+    return TAX_COLUMNS[:taxes] + [f'RECEITA {i + 1}' for i in range(len(TAX_COLUMNS), taxes)]
+
+def month_count(value):
+    """Tipo do argumento --months: um número de meses por ano, de 1 a 12."""
+    meses = int(value)
+    if not 1 <= meses <= len(MONTHS):
+        raise argparse.ArgumentTypeError(f"o número de meses deve estar entre 1 e {len(MONTHS)} (recebido: {meses})")
+    return meses
+
+def synthetic_revenue(years=25, months=12, entities=27, taxes=45, missing=0.1, first_year=2000, seed=0):
+    """Gera um DataFrame com o formato de arrecadacao-estado.csv (Ano, Mês, UF e uma coluna por imposto).
+    
+    Os valores seguem uma distribuição log-normal, com uma escala própria por
+    entidade e por imposto; uma fração missing das células fica vazia, como
+    nas colunas esparsas do arquivo real.
+    """
+    if not 1 <= months <= len(MONTHS):
+        raise ValueError(f"O número de meses deve estar entre 1 e {len(MONTHS)} (recebido: {months})")
+    rng = np.random.default_rng(seed)
+    nomes_meses = list(MONTHS)[:months]
+    entidades = entity_names(entities)
+    colunas = tax_names(taxes)
+    n = years * months * entities
+    
+    # Uma linha por (ano, mês, entidade), na mesma ordem do arquivo real
+    df = pd.DataFrame({
+        'Ano': np.repeat(np.arange(first_year, first_year + years), months * entities),
+        'Mês': np.tile(np.repeat(nomes_meses, entities), years),
+        'UF': np.tile(entidades, years * months),
+    })
+    
+    # Escala de cada entidade (tamanho da economia) e de cada imposto
+    escala = rng.normal(13, 1.5, entities)[np.tile(np.arange(entities), years * months)][:, None]
+    valores = np.round(rng.lognormal(0, 1, (n, taxes)) * np.exp(escala + rng.normal(0, 1, taxes)))
+    valores[rng.random((n, taxes)) < missing] = np.nan
+    
+    return pd.concat([df, pd.DataFrame(valores, columns=colunas)], axis=1)
+
+def write_synthetic_csv(file_path, **kwargs):
+    """Gera os dados sintéticos e os salva como o arquivo bruto (separador ';', latin1)."""
+    df = synthetic_revenue(**kwargs)
+    df.to_csv(file_path, sep=';', encoding='latin1', index=False, float_format='%.0f')
+    return file_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato de arrecadacao-estado.csv.")
+    parser.add_argument('output', help="arquivo CSV de saída")
+    parser.add_argument('--years', type=int, default=25)
+    parser.add_argument('--months', type=month_count, default=12, help="meses por ano (1 a 12)")
+    parser.add_argument('--entities', type=int, default=27, help="27 = estados; 5570 ≈ municípios")
+    parser.add_argument('--taxes', type=int, default=45)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    write_synthetic_csv(args.output, years=args.years, months=args.months, entities=args.entities,
+                        taxes=args.taxes, seed=args.seed)
+    print(f"Dados sintéticos salvos em {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
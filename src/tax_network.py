@@ -0,0 +1,154 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+import networkx as nx
+
+from centrality import centrality_year
+from communities import CommunityOptions, detect_many
+from graph_builder import GraphCache, value_columns
+from metrics_store import METRICS_FILE, MetricsStore, metric_rows
+from process_data import load_processed_data
+from render import RenderOptions
+
+# Opções da rede de impostos: tamanho da janela (em períodos), correlação mínima para uma aresta e se as séries
+# são correlacionadas pela variação (diferença dos logs entre períodos consecutivos) em vez do nível
+TaxNetworkOptions = namedtuple('TaxNetworkOptions', ['window', 'threshold', 'growth'], defaults=[12, 0.5, True])
+
+def tax_series(frame, period, columns=None):
+    """Arrecadação total de cada imposto por período (soma dos estados); retorna (períodos em ordem, impostos, matriz)."""
+    colunas = list(columns) if columns is not None else value_columns(frame)
+    totais = frame.groupby(period, observed=True)[colunas].sum().sort_index()
+    return totais.index.tolist(), colunas, totais.to_numpy(dtype='float64')
+
+def growth_rates(X):
+    """Variação de cada série entre períodos consecutivos (diferença dos logs); NaN onde algum dos valores não é positivo."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logs = np.where(X > 0, np.log(X), np.nan)
+    return np.vstack([np.full((1, X.shape[1]), np.nan), np.diff(logs, axis=0)])
+
+def running_sums(X):
+    """Somas acumuladas no tempo (com um zero inicial) das estatísticas de cada par de séries (i, j).
+    
+    Para cada par, só contam os períodos em que as duas séries têm valor:
+    contagem, soma e soma dos quadrados de i, e o produto cruzado de i e j.
+    As estatísticas de qualquer janela são a diferença entre dois acumulados.
+    """
+    valido = ~np.isnan(X)
+    
+    # Padroniza as séries antes de acumular, para que as diferenças de acumulados não percam precisão; a média e o
+    # desvio são calculados a partir das somas (impostos sem nenhum valor, comuns no arquivo real, ficam zerados)
+    v = valido.astype('float64')
+    contagem = np.maximum(v.sum(axis=0), 1.0)
+    media = np.where(valido, X, 0.0).sum(axis=0) / contagem
+    desvio = np.sqrt(np.where(valido, (X - media) ** 2, 0.0).sum(axis=0) / contagem)
+    x = np.where(valido, (X - media) / np.where(desvio > 0, desvio, 1.0), 0.0)
+    
+    somas = np.zeros((4, X.shape[0] + 1, X.shape[1], X.shape[1]))
+    for destino, (a, b) in zip(somas, [(v, v), (x, v), (x * x, v), (x, x)]):
+        np.cumsum(np.einsum('ti,tj->tij', a, b), axis=0, out=destino[1:])
+    return somas
+
+def rolling_correlations(X, window, min_periods=None):
+    """Correlação entre todos os pares de séries (colunas de X) em cada janela de window períodos consecutivos.
+    
+    Retorna um array (janelas × séries × séries); a janela k termina no
+    período k + window - 1. Pares com menos de min_periods períodos em comum
+    (por padrão, metade da janela) ou sem variação ficam com NaN, assim como a
+    diagonal. O custo é O(períodos × séries²), independente do tamanho da janela.
+    """
+    if window < 2 or window > X.shape[0]:
+        return np.empty((0, X.shape[1], X.shape[1]))
+    min_periods = max(3, window // 2) if min_periods is None else min_periods
+    
+    # Estatísticas de todas as janelas de uma só vez, pela diferença dos acumulados (sem percorrer cada janela)
+    somas = running_sums(X)
+    n, sx, sxx, sxy = somas[:, window:] - somas[:, :-window]
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_i, media_j = sx / n, np.swapaxes(sx, 1, 2) / n
+        covariancia = sxy / n - media_i * media_j
+        var_i = sxx / n - media_i ** 2
+        var_j = np.swapaxes(sxx, 1, 2) / n - media_j ** 2
+        correlacao = covariancia / np.sqrt(var_i * var_j)
+    
+    # Variâncias quase nulas são ruído de arredondamento (séries constantes na janela)
+    valida = (n >= min_periods) & (var_i > 1e-12) & (var_j > 1e-12)
+    correlacao = np.where(valida, np.clip(correlacao, -1.0, 1.0), np.nan)
+    correlacao[:, np.arange(X.shape[1]), np.arange(X.shape[1])] = np.nan
+    return correlacao
+
+def correlation_graph(correlacao, taxes, threshold=0.5):
+    """Grafo de impostos de uma janela: uma aresta, com a correlação como peso, para cada par acima de threshold.
+    
+    Todos os impostos são nós, mesmo sem arestas, para que as métricas de
+    janelas diferentes cubram o mesmo conjunto de nós.
+    """
+    i, j = np.nonzero(np.triu(np.nan_to_num(correlacao, nan=-np.inf) >= threshold, k=1))
+    nomes = np.asarray(taxes, dtype=object)
+    
+    G = nx.Graph()
+    G.add_nodes_from(taxes)
+    G.add_weighted_edges_from(zip(nomes[i], nomes[j], correlacao[i, j].tolist()))
+    return G
+
+def analyze_tax_network(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                        metrics=None, tax_options=TaxNetworkOptions(), community_options=CommunityOptions()):
+    """Analisa a rede de impostos (arestas entre impostos que variam juntos) de cada janela móvel de períodos.
+    
+    Cada janela é identificada pelo seu último período. As correlações de
+    todas as janelas vêm de somas acumuladas dos produtos cruzados das séries,
+    sem recalcular cada janela; sobre o grafo de cada janela são calculados o
+    grau de centralidade, a força e as comunidades (distribuídas entre os
+    processos de workers). Apenas as janelas que terminam nos períodos pedidos
+    em years são gravadas. Esta etapa só produz métricas: render_options é
+    aceito para manter a mesma assinatura das demais etapas do pipeline.
+    """
+    # Sem um cache compartilhado pelo pipeline, os dados são agregados por período aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    periodos, impostos, X = tax_series(graphs.frame, graphs.period)
+    if tax_options.growth:
+        X = growth_rates(X)
+    
+    correlacoes = rolling_correlations(X, tax_options.window)
+    fins = periodos[tax_options.window - 1:][:len(correlacoes)]
+    
+    # Só as janelas que terminam nos períodos pedidos são analisadas
+    pedidos = set(periodos if years is None else years)
+    janelas = [(k, periodo) for k, periodo in enumerate(fins) if periodo in pedidos]
+    grafos = [correlation_graph(correlacoes[k], impostos, tax_options.threshold) for k, _ in janelas]
+    particoes = detect_many(grafos, community_options, workers, labels=[periodo for _, periodo in janelas])
+    
+    linhas = {}
+    for (_, periodo), G, particao in zip(janelas, grafos, particoes):
+        linhas[periodo] = (
+            centrality_year(G) +
+            metric_rows('strength', dict(G.degree(weight='weight'))) +
+            metric_rows('community', particao)
+        )
+    
+    metrics.write('tax_network', linhas)
+    print(f"Rede de impostos de {len(linhas)} janela(s) de {tax_options.window} período(s) salva em {metrics.path}")
+    
+    # Períodos sem janela completa (os primeiros) também são registrados, sem métricas
+    return {periodo: [] for periodo in (periodos if years is None else years)}
+
+if __name__ == "__main__":
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
+    output_folder = 'C:/Users/Mateus/ProjetoReceita/images/tax_network_analysis'
+    
+    # Verifica se a pasta de saída existe, caso contrário, cria-a
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    # Carrega os dados mensais: janelas de 12 meses, uma por mês
+    df = load_processed_data(input_file, keep_month=True)
+    analyze_tax_network(df, output_folder, graphs=GraphCache(df, resolution='month'))
+    print("Análise da rede de impostos concluída!")
@@ -0,0 +1,142 @@
+import itertools
+import os
+
+import numpy as np
+import networkx as nx
+
+from communities import CommunityOptions, detect
+from community_detection import IPI_COLUMNS
+from graph_builder import GraphCache, edge_weights
+from metrics_store import METRICS_FILE, MetricsStore, metric_rows
+from process_data import load_processed_data
+from render import RenderOptions
+
+# Nó que representa o período corrente no grafo temporal (o rótulo do período só é aplicado nos resultados)
+PERIOD_NODE = 'Periodo'
+
+class TemporalGraph:
+    """Grafo estado-período com um único conjunto de nós e os pesos de todos os períodos em uma matriz período × estado.
+    
+    Períodos consecutivos têm os mesmos estados e diferem apenas nos pesos das
+    arestas estado-período. Em vez de construir um grafo por período, um único
+    grafo é mantido e, a cada transição, só as arestas que mudaram são
+    atualizadas. O período corrente é sempre o nó PERIOD_NODE.
+    """
+    
+    def __init__(self, df, columns, period='Ano'):
+        pesos = edge_weights(df, columns).groupby([df[period], df['UF'].astype(str)]).sum()
+        
+        # Linhas: períodos em ordem; colunas: estados (NaN onde o estado não aparece no período)
+        tabela = pesos.unstack()
+        self.periods = tabela.index.tolist()
+        self.states = tabela.columns.tolist()
+        self.present = tabela.notna().to_numpy()
+        self.weights = tabela.fillna(0.0).to_numpy(dtype='float64')
+    
+    def label(self, values, periodo):
+        """Troca PERIOD_NODE pelo rótulo do período nas chaves de um dicionário nó -> valor."""
+        return {periodo if node == PERIOD_NODE else node: value for node, value in values.items()}
+    
+    def degree_centrality(self, t):
+        """Grau de centralidade no período t, lido diretamente da matriz de presença (sem grafo)."""
+        presentes = np.flatnonzero(self.present[t])
+        if len(presentes) == 0:
+            return {PERIOD_NODE: 1.0}
+        
+        # Cada estado presente liga-se apenas ao período, que se liga a todos eles
+        escala = 1.0 / len(presentes)
+        return {PERIOD_NODE: 1.0, **{self.states[i]: escala for i in presentes}}
+    
+    def strength(self, t):
+        """Força (soma dos pesos das arestas) de cada nó no período t, lida diretamente da matriz de pesos."""
+        presentes = np.flatnonzero(self.present[t])
+        pesos = self.weights[t]
+        return {PERIOD_NODE: float(pesos.sum()), **{self.states[i]: float(pesos[i]) for i in presentes}}
+    
+    def sweep(self):
+        """Percorre os períodos em ordem sobre um único grafo, produzindo (índice, período, grafo).
+        
+        A cada transição, só os estados que entram ou saem e as arestas cujo peso
+        mudou são alterados. O grafo é o mesmo objeto em todos os períodos e não
+        deve ser modificado por quem o recebe.
+        """
+        G = nx.Graph()
+        G.add_node(PERIOD_NODE, bipartite=1)
+        
+        pesos_anteriores = np.zeros(len(self.states))
+        presentes_anteriores = np.zeros(len(self.states), dtype=bool)
+        
+        for t, periodo in enumerate(self.periods):
+            pesos, presentes = self.weights[t], self.present[t]
+            
+            # Estados que saem ou entram no grafo neste período
+            G.remove_nodes_from(self.states[i] for i in np.flatnonzero(presentes_anteriores & ~presentes))
+            G.add_nodes_from((self.states[i] for i in np.flatnonzero(presentes & ~presentes_anteriores)), bipartite=0)
+            
+            # Arestas novas ou com peso diferente do período anterior
+            mudaram = np.flatnonzero(presentes & (~presentes_anteriores | (pesos != pesos_anteriores)))
+            G.add_weighted_edges_from((self.states[i], PERIOD_NODE, pesos[i].item()) for i in mudaram)
+            
+            pesos_anteriores, presentes_anteriores = pesos, presentes
+            yield t, periodo, G
+
+def warm_start(G, partition):
+    """Partição inicial para o grafo a partir da anterior; nós novos começam em comunidades próprias."""
+    novas = itertools.count(max(partition.values(), default=-1) + 1)
+    return {node: partition[node] if node in partition else next(novas) for node in G}
+
+def analyze_temporal(df, output_folder, graphs=None, workers=1, render_options=RenderOptions(), years=None,
+                     metrics=None, columns=tuple(IPI_COLUMNS.values()), community_options=CommunityOptions()):
+    """Percorre os períodos sobre um único grafo temporal e grava grau, força e comunidades; retorna os arquivos gerados por período (nenhum).
+    
+    Com o Louvain, a partição do período anterior é apenas o ponto de
+    partida da detecção de cada período: os nós ainda podem mudar de
+    comunidade e as comunidades iniciais podem ser desfeitas. Os resultados
+    dependem, portanto, da ordem e dos dados de todos os períodos anteriores:
+    a varredura (inclusive os reinícios de cada período) é sempre serial e
+    começa no primeiro período; apenas os períodos pedidos em years são gravados.
+    workers e render_options são aceitos para manter a mesma assinatura das
+    demais etapas do pipeline.
+    """
+    # Sem um cache compartilhado pelo pipeline, os dados são agregados por período aqui
+    if graphs is None:
+        graphs = GraphCache(df)
+    
+    # Sem uma tabela compartilhada pelo pipeline, as métricas ficam na pasta de saída
+    if metrics is None:
+        metrics = MetricsStore(os.path.join(output_folder, METRICS_FILE))
+    
+    temporal = TemporalGraph(graphs.frame, list(columns), period=graphs.period)
+    pedidos = set(temporal.periods if years is None else years)
+    
+    linhas = {}
+    particao = None
+    for t, periodo, G in temporal.sweep():
+        particao = detect(G, community_options, None if particao is None else warm_start(G, particao), label=periodo)
+        if periodo not in pedidos:
+            continue
+        
+        linhas[periodo] = (
+            metric_rows('degree_centrality', temporal.label(temporal.degree_centrality(t), periodo)) +
+            metric_rows('strength', temporal.label(temporal.strength(t), periodo)) +
+            metric_rows('community', temporal.label(particao, periodo))
+        )
+    
+    metrics.write('temporal', linhas)
+    print(f"Análise temporal de {len(linhas)} período(s) salva em {metrics.path}")
+    
+    return {periodo: [] for periodo in linhas}
+
+if __name__ == "__main__":
+    # Caminho para o arquivo de dados brutos (os dados processados vêm do cache colunar)
+    input_file = 'C:/Users/Mateus/ProjetoReceita/data/arrecadacao-estado.csv'
+    output_folder = 'C:/Users/Mateus/ProjetoReceita/images/temporal_analysis'
+    
+    # Verifica se a pasta de saída existe, caso contrário, cria-a
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    # Carrega os dados mensais e percorre os meses sobre um único grafo
+    df = load_processed_data(input_file, keep_month=True)
+    analyze_temporal(df, output_folder, graphs=GraphCache(df, resolution='month'))
+    print("Análise temporal concluída!")
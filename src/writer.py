@@ -0,0 +1,103 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Escritor do processo atual (criado na primeira escrita; cada processo de run_years tem o seu)
+_writer = None
+_writer_pid = None
+
+def atomic_write(path, write):
+    """Executa write(caminho temporário) e só então troca o arquivo final, que nunca fica pela metade."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporario = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write(temporario)
+        os.replace(temporario, path)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return path
+
+def bytes_writer(data):
+    """Função de escrita (para atomic_write) que grava um conteúdo já pronto."""
+    def gravar(temporario):
+        with open(temporario, 'wb') as f:
+            f.write(data)
+    return gravar
+
+class BackgroundWriter:
+    """Grava arquivos em threads, enquanto o processo segue para o próximo ano.
+    
+    A fila é limitada a max_pending escritas: quando está cheia, quem envia
+    espera, e a memória ocupada pelos conteúdos pendentes não cresce sem
+    limite. Toda escrita é atômica (arquivo temporário renomeado no final).
+    Erros são guardados e levantados por flush.
+    """
+    
+    def __init__(self, workers=2, max_pending=8):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._errors = []
+    
+    def submit(self, path, write):
+        """Agenda write(caminho temporário) para o caminho final; retorna o caminho final imediatamente."""
+        self._slots.acquire()
+        try:
+            futuro = self._executor.submit(atomic_write, path, write)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(futuro)
+        futuro.add_done_callback(self._done)
+        return path
+    
+    def submit_bytes(self, path, data):
+        """Agenda a gravação de um conteúdo já pronto (ex.: uma imagem renderizada em memória)."""
+        return self.submit(path, bytes_writer(data))
+    
+    def _done(self, futuro):
+        with self._lock:
+            self._pending.discard(futuro)
+            if futuro.exception() is not None:
+                self._errors.append(futuro.exception())
+        self._slots.release()
+    
+    def flush(self):
+        """Espera todas as escritas pendentes; levanta o primeiro erro ocorrido desde o último flush."""
+        while True:
+            with self._lock:
+                pendentes = list(self._pending)
+            if not pendentes:
+                break
+            for futuro in pendentes:
+                futuro.exception()
+        
+        with self._lock:
+            erros, self._errors = self._errors, []
+        if erros:
+            raise erros[0]
+    
+    def close(self):
+        """Grava o que estiver pendente e encerra as threads."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+
+def get_writer():
+    """Retorna o escritor do processo atual, criando-o (e agendando o flush na saída) na primeira chamada."""
+    global _writer, _writer_pid
+    # Um processo criado por fork herda o escritor do pai, mas não as suas threads
+    if _writer is None or _writer_pid != os.getpid():
+        _writer, _writer_pid = BackgroundWriter(), os.getpid()
+        atexit.register(_writer.close)
+    return _writer
+
+def flush():
+    """Espera as escritas pendentes do processo atual (nada a fazer se nenhuma escrita foi agendada)."""
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.flush()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do projeto ficam em src/ e são importados diretamente (como nos blocos __main__)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from process_data import load_data, month_number, preprocess_chunked, preprocess_data
+
+# Arquivo bruto mínimo, terminado por uma linha vazia (';;;;'), como o arrecadacao-estado.csv
+RAW = (
+    "Ano;Mês;UF;IMPOSTO SOBRE IMPORTAÇÃO;IRPF\n"
+    "2000;Janeiro;AC;1;2\n"
+    "2000;Fevereiro;AC;3;4\n"
+    "2000;Janeiro;AL;5;6\n"
+    ";;;;\n"
+)
+
+@pytest.fixture
+def raw_file(tmp_path):
+    path = tmp_path / 'arrecadacao.csv'
+    path.write_bytes(RAW.encode('latin1'))
+    return str(path)
+
+def test_preprocess_monthly_ignores_trailing_blank_line(raw_file):
+    resultado = preprocess_data(load_data(raw_file), keep_month=True)
+    
+    assert len(resultado) == 3
+    assert sorted(resultado['Mês'].tolist()) == [1, 1, 2]
+
+def test_preprocess_chunked_monthly_ignores_trailing_blank_line(raw_file):
+    resultado = preprocess_chunked(raw_file, chunksize=2, keys=('Ano', 'Mês', 'UF'))
+    
+    assert len(resultado) == 3
+    assert resultado['IRPF'].sum() == 12
+
+def test_month_number_rejects_unknown_names():
+    with pytest.raises(ValueError, match='Marco'):
+        month_number(pd.Series(['Janeiro', 'Marco', None]))